@@ -6,7 +6,7 @@ from pydantic import BaseModel
 from typing import Optional
 
 from app.core.agents.orchestrator import orchestrator
-from app.core.rag.shared import case_generator
+from app.core.rag.shared import get_case_generator
 
 logger = logging.getLogger(__name__)
 
@@ -53,7 +53,7 @@ async def initialize_agents(request: InitializeRequest):
     Returns initial messages from patient, nurse, and senior doctor,
     plus simulation state (vitals, timeline, investigations).
     """
-    case = case_generator.get_case(request.case_id)
+    case = get_case_generator().get_case(request.case_id)
     if not case:
         raise HTTPException(status_code=404, detail="Case not found")
 
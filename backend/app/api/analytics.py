@@ -1,16 +1,17 @@
-from fastapi import APIRouter
-from app.core.session import session
+from fastapi import APIRouter, Depends
+from app.api.deps import current_session
+from app.core.session import SessionTracker
 
 router = APIRouter()
 
 
 @router.get("/performance")
-async def get_performance():
+async def get_performance(session: SessionTracker = Depends(current_session)):
     return session.get_performance_data()
 
 
 @router.get("/peer-comparison")
-async def get_peer_comparison():
+async def get_peer_comparison(session: SessionTracker = Depends(current_session)):
     profile = session.get_student_profile()
     scores = profile["specialty_scores"]
     return {
@@ -26,5 +27,5 @@ async def get_peer_comparison():
 
 
 @router.get("/recommendations")
-async def get_recommendations():
+async def get_recommendations(session: SessionTracker = Depends(current_session)):
     return session.get_recommendations()
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-from app.core.rag.shared import case_generator
-from app.core.session import session
+from app.core.rag.shared import get_case_generator
+from app.api.deps import current_session
+from app.core.session import SessionTracker
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -50,7 +55,7 @@ async def get_specialties():
 @router.post("/generate")
 async def generate_case(request: CaseRequest):
     try:
-        case = case_generator.generate_case(
+        case = await get_case_generator().generate_case_async(
             specialty=request.specialty,
             difficulty=request.difficulty,
             year_level=request.year_level,
@@ -63,12 +68,12 @@ async def generate_case(request: CaseRequest):
 @router.get("/corpus-stats")
 async def get_corpus_stats():
     """Get RAG corpus statistics."""
-    return case_generator.get_corpus_stats()
+    return get_case_generator().get_corpus_stats()
 
 
 @router.get("/{case_id}")
 async def get_case(case_id: str):
-    case = case_generator.get_case(case_id)
+    case = get_case_generator().get_case(case_id)
     if not case:
         raise HTTPException(status_code=404, detail="Case not found")
     return case
@@ -76,25 +81,31 @@ async def get_case(case_id: str):
 
 @router.post("/{case_id}/action")
 async def case_action(case_id: str, request: CaseActionRequest):
-    result = case_generator.process_action(case_id, request.action_type, request.student_input)
+    result = get_case_generator().process_action(case_id, request.action_type, request.student_input)
     return result
 
 
 @router.post("/{case_id}/diagnose")
-async def submit_diagnosis(case_id: str, request: DiagnosisRequest):
-    result = case_generator.evaluate_diagnosis(case_id, request.diagnosis, request.reasoning)
+async def submit_diagnosis(
+    case_id: str, request: DiagnosisRequest, session: SessionTracker = Depends(current_session)
+):
+    result = get_case_generator().evaluate_diagnosis(case_id, request.diagnosis, request.reasoning)
 
     # Record result in session tracker for dynamic analytics
-    case = case_generator.get_case(case_id)
+    case = get_case_generator().get_case(case_id)
     if case and "error" not in result:
-        session.record_case_result(
-            case_id=case_id,
-            specialty=case.get("specialty", ""),
-            difficulty=case.get("difficulty", ""),
-            diagnosis=request.diagnosis,
-            correct_diagnosis=result.get("correct_diagnosis", case.get("diagnosis", "")),
-            is_correct=result.get("is_correct", False),
-            accuracy_score=result.get("accuracy_score", 0),
-        )
+        try:
+            session.record_case_result(
+                case_id=case_id,
+                specialty=case.get("specialty", ""),
+                difficulty=case.get("difficulty", ""),
+                diagnosis=request.diagnosis,
+                correct_diagnosis=result.get("correct_diagnosis", case.get("diagnosis", "")),
+                is_correct=result.get("is_correct", False),
+                accuracy_score=result.get("accuracy_score", 0),
+            )
+        except TypeError as e:
+            # The evaluation itself is still valid; only the analytics entry is skipped
+            logger.warning(f"Not recording case {case_id} in session analytics: {e}")
 
     return result
@@ -0,0 +1,18 @@
+"""Dependencies shared by the API routers."""
+
+import re
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.core.session import SessionTracker, get_session
+
+# Accepted X-Session-Id values: UUIDs and similar opaque tokens, nothing that could bloat the session table
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{8,64}")
+
+
+async def current_session(x_session_id: Optional[str] = Header(None)) -> SessionTracker:
+    """SessionTracker for the client's X-Session-Id header, or the shared one without it."""
+    if x_session_id is not None and not SESSION_ID_PATTERN.fullmatch(x_session_id):
+        raise HTTPException(status_code=400, detail="Invalid X-Session-Id header")
+    return get_session(x_session_id)
@@ -100,8 +100,9 @@ async def send_message(request: SendMessageRequest):
         )
 
         # Get latest patient message
-        patient_messages = [msg for msg in simulation.messages if msg.role == "patient"]
-        latest_patient_message = patient_messages[-1].content
+        latest_patient_message = next(
+            msg.content for msg in reversed(simulation.messages) if msg.role == "patient"
+        )
 
         # Get feedback from this interaction (last few feedback items)
         recent_feedback = simulation.tutor_feedback[-2:]  # Evaluator + Tutor feedback
@@ -1,7 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from typing import Optional
-from app.core.session import session
+from app.api.deps import current_session
+from app.core.session import SessionTracker, KNOWLEDGE_GRAPH_PARTS
 
 router = APIRouter()
 
@@ -12,12 +13,12 @@ class ProfileUpdate(BaseModel):
 
 
 @router.get("/profile")
-async def get_profile():
+async def get_profile(session: SessionTracker = Depends(current_session)):
     return session.get_student_profile()
 
 
 @router.put("/profile")
-async def update_profile(update: ProfileUpdate):
+async def update_profile(update: ProfileUpdate, session: SessionTracker = Depends(current_session)):
     profile = session.get_student_profile()
     if update.name:
         profile["name"] = update.name
@@ -27,10 +28,16 @@ async def update_profile(update: ProfileUpdate):
 
 
 @router.get("/biases")
-async def get_biases():
+async def get_biases(session: SessionTracker = Depends(current_session)):
     return session.detect_biases()
 
 
 @router.get("/knowledge-graph")
-async def get_knowledge_graph():
-    return session.build_knowledge_graph()
+async def get_knowledge_graph(
+    include: Optional[str] = None, session: SessionTracker = Depends(current_session)
+):
+    """Full graph by default; `include` is a comma-separated subset of KNOWLEDGE_GRAPH_PARTS."""
+    if not include:
+        return session.build_knowledge_graph()
+    parts = tuple(p for p in KNOWLEDGE_GRAPH_PARTS if p in include.split(","))
+    return session.build_knowledge_graph(include=parts)
@@ -507,7 +507,7 @@ class DynamicKnowledgeBuilder:
                 context_parts.append("")
                 sources.append({
                     "case_id": meta.get("case_id", "unknown"),
-                    "title": meta.get("title", "Untitled"),
+                    "title": meta.get("title"),  # only full_narrative chunks store it; filled in below
                     "source": raw_source,
                     "confidence": confidence,
                     "specialty": meta.get("specialty", ""),
@@ -583,6 +583,12 @@ class DynamicKnowledgeBuilder:
             )
             _add_results(results, "INVESTIGATION REFERENCE FROM CORPUS")
 
+        untitled = {src["case_id"] for src in sources if src["title"] is None}
+        titles = self.vector_store.get_titles(sorted(untitled)) if untitled else {}
+        for src in sources:
+            if src["title"] is None:
+                src["title"] = titles.get(src["case_id"]) or "Untitled"
+
         context_text = "\n".join(context_parts) if context_parts else ""
         return context_text, sources
 
@@ -12,6 +12,7 @@ This is the BRAIN of the simulation:
 import logging
 import random
 import uuid
+from datetime import datetime
 from typing import Optional
 
 from app.core.agents.patient_agent import PatientAgent
@@ -760,7 +761,7 @@ class SimulationOrchestrator:
     """
 
     def __init__(self):
-        from app.core.rag.shared import case_generator
+        from app.core.rag.shared import get_case_generator
         from app.models.simulation import (
             SimulationState,
             PatientProfile,
@@ -772,7 +773,8 @@ class SimulationOrchestrator:
             FeedbackType,
         )
 
-        self._case_generator = case_generator
+        # Resolved on first use so importing the simulation router doesn't open ChromaDB
+        self._get_case_generator = get_case_generator
         self._simulations: dict[str, SimulationState] = {}
 
         # Store model refs for use in methods
@@ -787,7 +789,7 @@ class SimulationOrchestrator:
 
     def start_simulation(self, specialty: str = "general_medicine", difficulty: str = "intermediate"):
         """Start a new patient simulation, returning a SimulationState."""
-        case = self._case_generator.generate_case(specialty=specialty, difficulty=difficulty)
+        case = self._get_case_generator().generate_case(specialty=specialty, difficulty=difficulty)
         case_id = case.get("id", str(uuid.uuid4())[:8])
 
         # Map case data to PatientProfile
@@ -830,28 +832,33 @@ class SimulationOrchestrator:
         """Process a student message and return the updated SimulationState."""
         sim = self._get_or_raise(case_id)
 
-        # Record student message
-        sim.messages.append(self._SimulationMessage(role="student", content=student_message))
+        # Per-turn records are built from already-typed values, so skip re-validating them.
+        # They share one timestamp instead of each calling the default datetime.now()
+        now = datetime.now()
+        sim.messages.append(self._SimulationMessage.model_construct(
+            role="student", content=student_message, timestamp=now,
+        ))
 
         # Generate patient response using the agent orchestrator if possible
         patient_response = self._generate_patient_response(sim, student_message)
 
-        sim.messages.append(self._SimulationMessage(
+        sim.messages.append(self._SimulationMessage.model_construct(
             role="patient",
             content=patient_response,
             emotional_state=sim.emotional_state,
+            timestamp=now,
         ))
 
         # Generate tutor feedback
         feedback_type, feedback_msg = self._evaluate_student_message(student_message)
-        sim.tutor_feedback.append(self._TutorFeedback(type=feedback_type, message=feedback_msg))
+        sim.tutor_feedback.append(self._TutorFeedback.model_construct(
+            type=feedback_type, message=feedback_msg, timestamp=now,
+        ))
 
         return sim
 
     def complete_simulation(self, case_id: str, diagnosis: str, reasoning: str):
         """Mark simulation as complete with student's diagnosis."""
-        from datetime import datetime
-
         sim = self._get_or_raise(case_id)
         sim.student_diagnosis = diagnosis
         sim.student_reasoning = reasoning
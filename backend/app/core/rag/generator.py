@@ -1,24 +1,42 @@
 """RAG-powered clinical case generator using ChromaDB + Claude API."""
 
-import json
+import asyncio
+import copy
 import logging
 import os
+import re
+import sqlite3
+import sys
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from typing import Optional
 from pathlib import Path
-from datetime import datetime
 
 import anthropic
 
 from app.core.rag.vector_store import MedicalVectorStore
 from app.core.rag.retriever import MedicalRetriever
+from app.utils import fast_json
 
 logger = logging.getLogger(__name__)
 
-# Claude API case generation prompt
-CASE_GENERATION_PROMPT = """You are an expert medical case writer for Clinical-Mind, an AI-powered clinical reasoning simulator for Indian medical students (MBBS final year, interns, NEET-PG aspirants).
+# Maximum number of cases kept in memory; older ones are reloaded from disk on demand
+MAX_ACTIVE_CASES = 512
 
-Using the reference cases from the medical corpus below as inspiration and factual grounding, generate a UNIQUE, ORIGINAL clinical case that:
+# How often persisted cases older than 24 hours are swept from disk
+CLEANUP_INTERVAL_SECONDS = 60 * 60
+
+# System instruction for the JSON-returning calls; replies are still fence-stripped in case
+JSON_SYSTEM_PROMPT = "Respond with only the requested JSON object: no markdown code fences and no commentary."
+
+# Claude API case generation prompt, split so only the small request footer is formatted
+# per call. The header and schema are static, byte-identical across requests, and lead the
+# prompt; the retrieved <chunk> blocks and the request footer follow.
+CASE_GENERATION_HEADER = sys.intern("""You are an expert medical case writer for Clinical-Mind, an AI-powered clinical reasoning simulator for Indian medical students (MBBS final year, interns, NEET-PG aspirants).
+
+Using the reference cases from the medical corpus (provided as <chunk> blocks below) as inspiration and factual grounding, generate a UNIQUE, ORIGINAL clinical case that:
 
 1. Is set in an Indian healthcare context (Indian demographics, locations, disease patterns, healthcare system)
 2. Matches the requested specialty and difficulty level
@@ -33,31 +51,35 @@ IMPORTANT RULES:
 - For "intermediate" cases: some atypical features, requires careful analysis
 - For "advanced" cases: atypical presentation, multiple co-morbidities, diagnostic dilemmas
 
-{rag_context}
+""")
+
+CASE_GENERATION_FOOTER = """
 
 Generate a case for:
 - Specialty: {specialty}
 - Difficulty: {difficulty}
 - Student Level: {year_level}
 
-Respond with ONLY a valid JSON object (no markdown, no explanation) with this exact structure:
-{{
-  "patient": {{"age": <int>, "gender": "<Male/Female>", "location": "<Indian city, state>"}},
+Respond with ONLY the JSON object described above."""
+
+CASE_GENERATION_SCHEMA = sys.intern("""Respond with ONLY a valid JSON object (no markdown, no explanation) with this exact structure:
+{
+  "patient": {"age": <int>, "gender": "<Male/Female>", "location": "<Indian city, state>"},
   "chief_complaint": "<brief chief complaint>",
   "initial_presentation": "<2-3 sentence clinical vignette presented to the student>",
-  "vital_signs": {{"bp": "<systolic/diastolic>", "hr": <int>, "rr": <int>, "temp": <float>, "spo2": <int>}},
+  "vital_signs": {"bp": "<systolic/diastolic>", "hr": <int>, "rr": <int>, "temp": <float>, "spo2": <int>},
   "stages": [
-    {{"stage": "history", "info": "<detailed history findings revealed when student takes history>"}},
-    {{"stage": "physical_exam", "info": "<detailed physical exam findings>"}},
-    {{"stage": "labs", "info": "<investigation results including labs, imaging, special tests>"}}
+    {"stage": "history", "info": "<detailed history findings revealed when student takes history>"},
+    {"stage": "physical_exam", "info": "<detailed physical exam findings>"},
+    {"stage": "labs", "info": "<investigation results including labs, imaging, special tests>"}
   ],
   "diagnosis": "<correct final diagnosis>",
   "differentials": ["<differential 1>", "<differential 2>", "<differential 3>", "<differential 4>", "<differential 5>"],
   "learning_points": ["<point 1>", "<point 2>", "<point 3>", "<point 4>"],
   "atypical_features": "<what makes this case challenging or unique>",
-  "specialty": "{specialty}",
-  "difficulty": "{difficulty}"
-}}"""
+  "specialty": "<requested specialty, exactly as given>",
+  "difficulty": "<requested difficulty, exactly as given>"
+}""")
 
 EVALUATION_PROMPT = """You are a clinical reasoning evaluator for medical students. A student has submitted a diagnosis for a clinical case.
 
@@ -85,16 +107,46 @@ Respond with ONLY a valid JSON object:
 }}"""
 
 
+
+def _strip_json_fences(text: str) -> str:
+    """Return Claude's reply with any markdown code fence (```json ... ```) around the JSON removed."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("```")[1]
+        if text.startswith("json"):
+            text = text[4:]
+        text = text.strip()
+    return text
+
 class CaseGenerator:
     """RAG-powered clinical case generator using ChromaDB + Claude API."""
 
     def __init__(self, vector_store: Optional[MedicalVectorStore] = None):
-        # Create persistent storage directory
+        # Create persistent storage: one SQLite database (WAL mode) holding every active case
         self.storage_dir = Path("./data/active_cases")
         self.storage_dir.mkdir(parents=True, exist_ok=True)
-
-        # Load persisted cases on startup
-        self.active_cases: dict = self._load_persisted_cases()
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(self.storage_dir / "cases.sqlite", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS cases (id TEXT PRIMARY KEY, blob BLOB, ts REAL)")
+        self._db.commit()
+        self._migrate_json_case_files()
+
+        # Load persisted cases on startup, dropping expired ones first so they are never served
+        self._cleanup_old_cases()
+        self.active_cases: OrderedDict[str, dict] = OrderedDict(self._load_persisted_cases())
+        # Compiled diagnosis keyword matchers for the fallback evaluator (memory only)
+        self._diagnosis_patterns: dict[str, Optional[re.Pattern]] = {}
+        # In-flight background disk saves from generate_case_async
+        self._pending_saves: set[asyncio.Task] = set()
+        # In-flight generations keyed by (specialty, difficulty, year_level), for request coalescing
+        self._inflight: dict[tuple[str, str, str], asyncio.Task] = {}
+
+        # Sweep old cases on a background timer rather than on the request path
+        self._cleanup_timer: Optional[threading.Timer] = None
+        self._cleanup_stopped = False
+        self._schedule_cleanup()
+        self._evict_lru_cases()
         logger.info(f"Loaded {len(self.active_cases)} persisted cases from disk")
 
         # Initialize vector store and retriever
@@ -104,6 +156,11 @@ class CaseGenerator:
             self.vector_store = MedicalVectorStore()
         self.retriever = MedicalRetriever(self.vector_store)
 
+        # Raw corpus cases by id, for the no-Claude fallback path; rebuilt on a miss once the
+        # corpus files have changed (e.g. scripts.ingest --scrape/--pdf while the server runs)
+        self._corpus_signature = self._read_corpus_signature()
+        self._corpus_index: dict[str, dict] = self._build_corpus_index()
+
         # Initialize Claude client
         self.api_key = os.environ.get("ANTHROPIC_API_KEY", "")
         self.client = None
@@ -127,8 +184,6 @@ class CaseGenerator:
         year_level: str = "final_year",
     ) -> dict:
         """Generate a unique clinical case using RAG context + Claude API."""
-        case_id = str(uuid.uuid4())[:8]
-
         # Step 1: Retrieve relevant context from ChromaDB
         rag_context = self.retriever.retrieve_case_context(
             specialty=specialty,
@@ -136,7 +191,58 @@ class CaseGenerator:
             n_results=5,
         )
 
-        # Step 2: Generate case via Claude API (or fallback to RAG-only)
+        # Steps 2-3: Generate via Claude, or fall back to the corpus
+        case_data = self._build_case(specialty, difficulty, year_level, rag_context)
+        case_id = self._register_case(case_data)
+
+        # Save to persistent storage
+        self._save_case_to_disk(case_id, case_data)
+
+        return case_data
+
+    async def generate_case_async(
+        self,
+        specialty: str,
+        difficulty: str = "intermediate",
+        year_level: str = "final_year",
+    ) -> dict:
+        """Event-loop friendly generate_case: blocking work runs in threads, disk save in the background.
+
+        Concurrent requests for the same (specialty, difficulty, year_level) share one
+        in-flight generation; each caller gets its own copy under a new case id.
+        """
+        key = (specialty, difficulty, year_level)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._retrieve_and_build_case(specialty, difficulty, year_level))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.info(f"Coalescing case generation for {key}")
+
+        # Shield so one cancelled request doesn't cancel the generation others are awaiting
+        case_data = copy.deepcopy(await asyncio.shield(task))
+        case_id = self._register_case(case_data)
+
+        # Persist off the request path; keep a reference so the task isn't garbage collected
+        save_task = asyncio.create_task(asyncio.to_thread(self._save_case_to_disk, case_id, case_data))
+        self._pending_saves.add(save_task)
+        save_task.add_done_callback(self._pending_saves.discard)
+
+        return case_data
+
+    async def _retrieve_and_build_case(self, specialty: str, difficulty: str, year_level: str) -> dict:
+        """Run retrieval and generation for generate_case_async in worker threads."""
+        rag_context = await asyncio.to_thread(
+            self.retriever.retrieve_case_context,
+            specialty=specialty,
+            difficulty=difficulty,
+            n_results=5,
+        )
+        return await asyncio.to_thread(self._build_case, specialty, difficulty, year_level, rag_context)
+
+    def _build_case(self, specialty: str, difficulty: str, year_level: str, rag_context: str) -> dict:
+        """Generate case data via Claude API, falling back to the corpus when unavailable."""
         case_data = None
         if self.client and rag_context:
             case_data = self._generate_with_claude(
@@ -146,21 +252,19 @@ class CaseGenerator:
                 rag_context=rag_context,
             )
 
-        # Step 3: Fallback to corpus-based case if Claude unavailable
         if not case_data:
             case_data = self._fallback_from_corpus(specialty, difficulty)
 
+        return case_data
+
+    def _register_case(self, case_data: dict) -> str:
+        """Assign a new id to case data and make it available to the other endpoints."""
+        case_id = str(uuid.uuid4())[:8]
         case_data["id"] = case_id
         self.active_cases[case_id] = case_data
-
-        # Save to persistent storage
-        self._save_case_to_disk(case_id, case_data)
-
-        # Clean up old cases periodically
-        if len(self.active_cases) > 20:  # Cleanup when we have many cases
-            self._cleanup_old_cases()
-
-        return case_data
+        self._diagnosis_patterns[case_id] = self._compile_diagnosis_pattern(case_data.get("diagnosis", ""))
+        self._evict_lru_cases()
+        return case_id
 
     def _generate_with_claude(
         self,
@@ -170,34 +274,32 @@ class CaseGenerator:
         rag_context: str,
     ) -> Optional[dict]:
         """Generate a case using Claude API with RAG context."""
-        prompt = CASE_GENERATION_PROMPT.format(
-            rag_context=rag_context,
-            specialty=specialty,
-            difficulty=difficulty,
-            year_level=year_level,
-        )
+        # Static parts first so every request shares the longest possible prompt prefix
+        prompt = "".join((
+            CASE_GENERATION_HEADER,
+            CASE_GENERATION_SCHEMA,
+            "\n\n",
+            rag_context,
+            CASE_GENERATION_FOOTER.format(
+                specialty=specialty,
+                difficulty=difficulty,
+                year_level=year_level,
+            ),
+        ))
 
         try:
             response = self.client.messages.create(
                 model="claude-opus-4-6",
                 max_tokens=4096,
+                system=JSON_SYSTEM_PROMPT,
                 messages=[{"role": "user", "content": prompt}],
             )
 
-            response_text = response.content[0].text.strip()
-
-            # Parse JSON from response (handle potential markdown wrapping)
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-                response_text = response_text.strip()
-
-            case_data = json.loads(response_text)
+            case_data = fast_json.loads(_strip_json_fences(response.content[0].text))
             logger.info(f"Claude generated case: {case_data.get('diagnosis', 'unknown')}")
             return case_data
 
-        except json.JSONDecodeError as e:
+        except fast_json.JSONDecodeError as e:
             logger.error(f"Failed to parse Claude response as JSON: {e}")
         except anthropic.APIError as e:
             logger.error(f"Claude API error: {e}")
@@ -214,6 +316,7 @@ class CaseGenerator:
             difficulty=difficulty,
             n_results=1,
             chunk_type="full_narrative",
+            include=["metadatas", "documents"],
         )
 
         if results:
@@ -246,38 +349,67 @@ class CaseGenerator:
         # Absolute fallback if nothing in corpus
         return self._empty_case(specialty, difficulty)
 
-    def _load_case_from_corpus(self, case_id: str, specialty: str) -> Optional[dict]:
-        """Load the original structured case from corpus JSON files."""
+    @staticmethod
+    def _build_corpus_index() -> dict[str, dict]:
+        """Index every corpus case by id so corpus fallbacks don't re-scan the JSON files."""
+        from app.core.rag.vector_store import CORPUS_DIR, iter_corpus_files
+
+        index: dict[str, dict] = {}
+        if not CORPUS_DIR.exists():
+            return index
+        for cases in iter_corpus_files(CORPUS_DIR):
+            for case in cases:
+                if case.get("id"):
+                    index[case["id"]] = case
+        return index
+
+    @staticmethod
+    def _read_corpus_signature() -> tuple:
+        """Name, size and mtime of every corpus file, to tell when the index is out of date."""
         from app.core.rag.vector_store import CORPUS_DIR
-        import json
 
-        for json_file in CORPUS_DIR.glob("*.json"):
-            try:
-                with open(json_file) as f:
-                    cases = json.load(f)
-                for case in cases:
-                    if case.get("id") == case_id:
-                        # Transform to API format
-                        return {
-                            "patient": case.get("demographics", {"age": 35, "gender": "Unknown", "location": "India"}),
-                            "chief_complaint": case.get("chief_complaint", ""),
-                            "initial_presentation": case.get("presentation", ""),
-                            "vital_signs": case.get("vital_signs", {}),
-                            "stages": case.get("stages", [
-                                {"stage": "history", "info": case.get("history", "")},
-                                {"stage": "physical_exam", "info": case.get("physical_exam", "")},
-                                {"stage": "labs", "info": case.get("investigations", "")},
-                            ]),
-                            "diagnosis": case.get("diagnosis", ""),
-                            "differentials": case.get("differentials", []),
-                            "learning_points": case.get("learning_points", []),
-                            "atypical_features": case.get("atypical_features", ""),
-                            "specialty": case.get("specialty", specialty),
-                            "difficulty": case.get("difficulty", "intermediate"),
-                        }
-            except Exception:
-                continue
-        return None
+        if not CORPUS_DIR.exists():
+            return ()
+        signature = []
+        for path in sorted(CORPUS_DIR.iterdir()):
+            if path.suffix in (".json", ".jsonl"):
+                stat = path.stat()
+                signature.append((path.name, stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def _load_case_from_corpus(self, case_id: str, specialty: str) -> Optional[dict]:
+        """Load the original structured case from the in-memory corpus index."""
+        case = self._corpus_index.get(case_id)
+        if case is None:
+            signature = self._read_corpus_signature()
+            if signature != self._corpus_signature:
+                logger.info("Corpus files changed, rebuilding the corpus index")
+                self._corpus_signature = signature
+                self._corpus_index = self._build_corpus_index()
+                case = self._corpus_index.get(case_id)
+        # Deep copy so sessions mutating nested fields never touch the shared index
+        return copy.deepcopy(self._corpus_case_to_api(case, specialty)) if case else None
+
+    @staticmethod
+    def _corpus_case_to_api(case: dict, specialty: str) -> dict:
+        """Transform a raw corpus case into the API case format."""
+        return {
+            "patient": case.get("demographics", {"age": 35, "gender": "Unknown", "location": "India"}),
+            "chief_complaint": case.get("chief_complaint", ""),
+            "initial_presentation": case.get("presentation", ""),
+            "vital_signs": case.get("vital_signs", {}),
+            "stages": case.get("stages", [
+                {"stage": "history", "info": case.get("history", "")},
+                {"stage": "physical_exam", "info": case.get("physical_exam", "")},
+                {"stage": "labs", "info": case.get("investigations", "")},
+            ]),
+            "diagnosis": case.get("diagnosis", ""),
+            "differentials": case.get("differentials", []),
+            "learning_points": case.get("learning_points", []),
+            "atypical_features": case.get("atypical_features", ""),
+            "specialty": case.get("specialty", specialty),
+            "difficulty": case.get("difficulty", "intermediate"),
+        }
 
     def _empty_case(self, specialty: str, difficulty: str) -> dict:
         """Return a placeholder case when corpus is empty."""
@@ -294,31 +426,37 @@ class CaseGenerator:
             "difficulty": difficulty,
         }
 
+    def _evict_lru_cases(self):
+        """Drop least recently used cases from memory once over MAX_ACTIVE_CASES (disk copies remain)."""
+        while len(self.active_cases) > MAX_ACTIVE_CASES:
+            evicted_id, _ = self.active_cases.popitem(last=False)
+            self._diagnosis_patterns.pop(evicted_id, None)
+
     def get_case(self, case_id: str) -> Optional[dict]:
         # First check in-memory cache
         case = self.active_cases.get(case_id)
         if case:
+            self.active_cases.move_to_end(case_id)
             return case
 
         # If not in memory, try loading from disk
-        case_file = self.storage_dir / f"{case_id}.json"
-        if case_file.exists():
-            try:
-                with open(case_file, 'r') as f:
-                    data = json.load(f)
-                    case_data = data.get("case_data")
-                    if case_data:
-                        # Cache it in memory for future use
-                        self.active_cases[case_id] = case_data
-                        logger.info(f"Loaded case {case_id} from disk cache")
-                        return case_data
-            except Exception as e:
-                logger.error(f"Failed to load case {case_id} from disk: {e}")
+        try:
+            with self._db_lock:
+                row = self._db.execute("SELECT blob FROM cases WHERE id = ?", (case_id,)).fetchone()
+            if row:
+                case_data = fast_json.loads(row[0])
+                # Cache it in memory for future use
+                self.active_cases[case_id] = case_data
+                self._evict_lru_cases()
+                logger.info(f"Loaded case {case_id} from disk cache")
+                return case_data
+        except Exception as e:
+            logger.error(f"Failed to load case {case_id} from disk: {e}")
 
         return None
 
     def process_action(self, case_id: str, action_type: str, student_input: Optional[str] = None) -> dict:
-        case = self.active_cases.get(case_id)
+        case = self.get_case(case_id)
         if not case:
             return {"error": "Case not found"}
 
@@ -339,20 +477,37 @@ class CaseGenerator:
 
     def evaluate_diagnosis(self, case_id: str, diagnosis: str, reasoning: str = "") -> dict:
         """Evaluate student diagnosis using RAG context + Claude API for rich feedback."""
-        case = self.active_cases.get(case_id)
+        case = self.get_case(case_id)
         if not case:
             return {"error": "Case not found"}
 
         correct_diagnosis = case.get("diagnosis", "")
 
-        # Try Claude API evaluation with RAG context
+        # Try Claude API evaluation with RAG context (reusing cached evaluations of similar answers)
         if self.client:
-            evaluation = self._evaluate_with_claude(
+            evaluation = self.vector_store.get_cached_evaluation(
+                case_id=case_id,
                 correct_diagnosis=correct_diagnosis,
                 student_diagnosis=diagnosis,
                 student_reasoning=reasoning,
-                specialty=case.get("specialty", ""),
             )
+            if evaluation:
+                logger.info(f"Evaluation cache hit for case {case_id}")
+            else:
+                evaluation = self._evaluate_with_claude(
+                    correct_diagnosis=correct_diagnosis,
+                    student_diagnosis=diagnosis,
+                    student_reasoning=reasoning,
+                    specialty=case.get("specialty", ""),
+                )
+                if evaluation:
+                    self.vector_store.cache_evaluation(
+                        case_id=case_id,
+                        correct_diagnosis=correct_diagnosis,
+                        student_diagnosis=diagnosis,
+                        student_reasoning=reasoning,
+                        evaluation=evaluation,
+                    )
             if evaluation:
                 evaluation["correct_diagnosis"] = correct_diagnosis
                 evaluation["student_diagnosis"] = diagnosis
@@ -360,11 +515,10 @@ class CaseGenerator:
                 return evaluation
 
         # Fallback: keyword-based matching
-        is_correct = any(
-            keyword in diagnosis.lower()
-            for keyword in correct_diagnosis.lower().split()
-            if len(keyword) > 3
-        )
+        if case_id not in self._diagnosis_patterns:
+            self._diagnosis_patterns[case_id] = self._compile_diagnosis_pattern(correct_diagnosis)
+        pattern = self._diagnosis_patterns[case_id]
+        is_correct = bool(pattern and pattern.search(diagnosis))
 
         return {
             "student_diagnosis": diagnosis,
@@ -379,6 +533,14 @@ class CaseGenerator:
             "suggested_review_topics": [],
         }
 
+    @staticmethod
+    def _compile_diagnosis_pattern(correct_diagnosis: str) -> Optional[re.Pattern]:
+        """Compile the diagnosis keywords (len > 3) into a single case-insensitive alternation."""
+        keywords = [kw for kw in correct_diagnosis.split() if len(kw) > 3]
+        if not keywords:
+            return None
+        return re.compile("|".join(re.escape(kw) for kw in keywords), re.IGNORECASE)
+
     def _evaluate_with_claude(
         self,
         correct_diagnosis: str,
@@ -403,17 +565,11 @@ class CaseGenerator:
             response = self.client.messages.create(
                 model="claude-opus-4-6",
                 max_tokens=2048,
+                system=JSON_SYSTEM_PROMPT,
                 messages=[{"role": "user", "content": prompt}],
             )
 
-            response_text = response.content[0].text.strip()
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-                response_text = response_text.strip()
-
-            return json.loads(response_text)
+            return fast_json.loads(_strip_json_fences(response.content[0].text))
 
         except Exception as e:
             logger.error(f"Claude evaluation error: {e}")
@@ -426,40 +582,77 @@ class CaseGenerator:
     def _save_case_to_disk(self, case_id: str, case_data: dict):
         """Save a case to persistent storage."""
         try:
-            case_file = self.storage_dir / f"{case_id}.json"
-            with open(case_file, 'w') as f:
-                json.dump({
-                    "case_id": case_id,
-                    "case_data": case_data,
-                    "timestamp": datetime.now().isoformat()
-                }, f, indent=2)
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cases (id, blob, ts) VALUES (?, ?, ?)",
+                    (case_id, fast_json.dumps(case_data), time.time()),
+                )
+                self._db.commit()
             logger.info(f"Saved case {case_id} to disk")
         except Exception as e:
             logger.error(f"Failed to save case {case_id} to disk: {e}")
 
     def _load_persisted_cases(self) -> dict:
-        """Load all persisted cases from disk."""
+        """Load the most recently saved cases from disk, oldest first (LRU order)."""
         cases = {}
         try:
-            for case_file in self.storage_dir.glob("*.json"):
-                with open(case_file, 'r') as f:
-                    data = json.load(f)
-                    case_id = data.get("case_id")
-                    case_data = data.get("case_data")
-                    if case_id and case_data:
-                        cases[case_id] = case_data
-                        logger.debug(f"Loaded case {case_id} from disk")
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT id, blob FROM cases ORDER BY ts DESC LIMIT ?", (MAX_ACTIVE_CASES,)
+                ).fetchall()
+            for case_id, blob in reversed(rows):
+                cases[case_id] = fast_json.loads(blob)
         except Exception as e:
             logger.error(f"Failed to load persisted cases: {e}")
         return cases
 
+    def _migrate_json_case_files(self):
+        """Import cases saved by the older one-JSON-file-per-case storage, then remove the files."""
+        for case_file in self.storage_dir.glob("*.json"):
+            try:
+                data = fast_json.loads(case_file.read_bytes())
+                case_id = data.get("case_id")
+                case_data = data.get("case_data")
+                if case_id and case_data:
+                    with self._db_lock:
+                        self._db.execute(
+                            "INSERT OR IGNORE INTO cases (id, blob, ts) VALUES (?, ?, ?)",
+                            (case_id, fast_json.dumps(case_data), case_file.stat().st_mtime),
+                        )
+                        self._db.commit()
+                case_file.unlink()
+                logger.debug(f"Migrated case file {case_file.name} into SQLite")
+            except Exception as e:
+                logger.error(f"Failed to migrate case file {case_file.name}: {e}")
+
+    def _schedule_cleanup(self):
+        """Arm the next periodic disk cleanup, unless stop_cleanup() has been called."""
+        if self._cleanup_stopped:
+            return
+        self._cleanup_timer = threading.Timer(CLEANUP_INTERVAL_SECONDS, self._periodic_cleanup)
+        self._cleanup_timer.daemon = True
+        self._cleanup_timer.start()
+
+    def stop_cleanup(self):
+        """Cancel the periodic disk cleanup (e.g. on application shutdown)."""
+        self._cleanup_stopped = True
+        if self._cleanup_timer is not None:
+            self._cleanup_timer.cancel()
+
+    def _periodic_cleanup(self):
+        """Timer callback: clean up old cases, then reschedule."""
+        try:
+            self._cleanup_old_cases()
+        finally:
+            self._schedule_cleanup()
+
     def _cleanup_old_cases(self):
         """Clean up cases older than 24 hours."""
         try:
-            cutoff_time = datetime.now().timestamp() - (24 * 60 * 60)  # 24 hours ago
-            for case_file in self.storage_dir.glob("*.json"):
-                if case_file.stat().st_mtime < cutoff_time:
-                    case_file.unlink()
-                    logger.debug(f"Cleaned up old case file: {case_file.name}")
+            cutoff_time = time.time() - (24 * 60 * 60)  # 24 hours ago
+            with self._db_lock:
+                deleted = self._db.execute("DELETE FROM cases WHERE ts < ?", (cutoff_time,)).rowcount
+                self._db.commit()
+            logger.debug(f"Cleaned up {deleted} old cases")
         except Exception as e:
             logger.error(f"Failed to cleanup old cases: {e}")
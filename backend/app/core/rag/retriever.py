@@ -1,18 +1,98 @@
 """RAG retriever - queries ChromaDB and formats context for Claude API."""
 
 import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional
 
 from app.core.rag.vector_store import MedicalVectorStore
 
 logger = logging.getLogger(__name__)
 
+# Query result cache: exact matches on (query, filters), plus, for free-text queries only,
+# near-duplicates whose embedding cosine similarity clears SEMANTIC_CACHE_THRESHOLD
+QUERY_CACHE_TTL_SECONDS = 600
+QUERY_CACHE_MAX_SIZE = 256
+SEMANTIC_CACHE_MAX_SIZE = 64
+SEMANTIC_CACHE_THRESHOLD = 0.97
+
+
+def format_chunk(chunk_id: str, content: str) -> str:
+    """Render one retrieved chunk as a tagged, position-independent prompt block."""
+    return f'<chunk id="{chunk_id}">\n{content}\n</chunk>'
+
 
 class MedicalRetriever:
     """Retrieves relevant medical case context from the vector store for case generation."""
 
     def __init__(self, vector_store: MedicalVectorStore):
         self.vector_store = vector_store
+        self._query_cache: OrderedDict[tuple, tuple[list[dict], float]] = OrderedDict()
+        # (filters key, unit-norm query embedding, results, cached_at)
+        self._semantic_cache: list[tuple[tuple, list[float], list[dict], float]] = []
+        # Retrieval runs in worker threads (generate_case_async), so guard the caches
+        self._cache_lock = threading.Lock()
+
+    def _query(self, query_text: str, semantic: bool = False, **filters) -> list[dict]:
+        """vector_store.query with exact-match result caching, plus semantic caching if `semantic`.
+
+        Cache keys include the store's generation, so ingests and resets invalidate them.
+        Templated queries leave `semantic` off: their text is fixed by their parameters, so
+        the exact tier already catches every repeat, and variants differing by one word
+        (e.g. the difficulty) could otherwise clear the threshold.
+        """
+        now = time.time()
+        filters_key = (self.vector_store.generation, tuple(sorted(filters.items())))
+        key = (query_text, filters_key)
+
+        with self._cache_lock:
+            cached = self._query_cache.get(key)
+            if cached and now - cached[1] < QUERY_CACHE_TTL_SECONDS:
+                self._query_cache.move_to_end(key)
+                return cached[0]
+
+        query_embedding = self.vector_store.embed_query(query_text) if semantic else None
+        if query_embedding is not None:
+            results = self._semantic_lookup(filters_key, query_embedding, now)
+            if results is not None:
+                logger.debug(f"Semantic query cache hit for '{query_text[:60]}'")
+                self._remember(key, results, now)
+                return results
+
+        results = self.vector_store.query(query_text=query_text, query_embedding=query_embedding, **filters)
+        self._remember(key, results, now)
+        if query_embedding is not None:
+            with self._cache_lock:
+                self._semantic_cache.append((filters_key, query_embedding, results, now))
+                del self._semantic_cache[:-SEMANTIC_CACHE_MAX_SIZE]
+        return results
+
+    def _remember(self, key: tuple, results: list[dict], now: float):
+        with self._cache_lock:
+            self._query_cache[key] = (results, now)
+            self._query_cache.move_to_end(key)
+            while len(self._query_cache) > QUERY_CACHE_MAX_SIZE:
+                self._query_cache.popitem(last=False)
+
+    def _semantic_lookup(self, filters_key: tuple, query_embedding: list[float], now: float) -> Optional[list[dict]]:
+        """Return cached results for the most similar earlier query with the same filters."""
+        with self._cache_lock:
+            candidates = [
+                (emb, results) for key, emb, results, cached_at in self._semantic_cache
+                if key == filters_key and now - cached_at < QUERY_CACHE_TTL_SECONDS
+            ]
+        if not candidates:
+            return None
+
+        import numpy as np
+
+        # Embeddings are unit-norm, so the dot product is the cosine similarity
+        similarities = np.asarray([emb for emb, _ in candidates]) @ np.asarray(query_embedding)
+        best = int(similarities.argmax())
+        if similarities[best] >= SEMANTIC_CACHE_THRESHOLD:
+            return candidates[best][1]
+        return None
 
     def retrieve_case_context(
         self,
@@ -30,22 +110,16 @@ class MedicalRetriever:
         if topic_hint:
             query += f", related to {topic_hint}"
 
-        # Get full narrative cases as primary context
-        results = self.vector_store.query(
+        # Get full narrative cases as primary context, falling back to other specialties
+        # within the same search when this specialty has none
+        results = self._query(
             query_text=query,
             specialty=specialty,
             n_results=n_results,
             chunk_type="full_narrative",
+            prefer_specialty=True,
         )
 
-        if not results:
-            # Fallback: try without specialty filter
-            results = self.vector_store.query(
-                query_text=query,
-                n_results=n_results,
-                chunk_type="full_narrative",
-            )
-
         if not results:
             logger.warning(f"No RAG context found for specialty={specialty}, difficulty={difficulty}")
             return ""
@@ -58,9 +132,10 @@ class MedicalRetriever:
             "",
         ]
 
-        for i, result in enumerate(results, 1):
-            context_parts.append(f"--- Reference Case {i} (Relevance: {result['relevance_score']:.2f}) ---")
-            context_parts.append(result["content"])
+        # Each chunk is a self-contained block tagged by its stable chunk id, with nothing
+        # query-specific inside it, so the same chunk renders byte-identically in every prompt
+        for result in results:
+            context_parts.append(format_chunk(result["id"], result["content"]))
             context_parts.append("")
 
         context_parts.append("=== END OF REFERENCE CASES ===")
@@ -75,20 +150,14 @@ class MedicalRetriever:
         """Retrieve context relevant to a specific diagnosis for evaluating student answers."""
         query = f"Diagnosis: {diagnosis}. Clinical features, differentials, and learning points."
 
-        results = self.vector_store.query(
+        results = self._query(
             query_text=query,
             specialty=specialty,
             n_results=3,
             chunk_type="learning",
+            prefer_specialty=True,
         )
 
-        if not results:
-            results = self.vector_store.query(
-                query_text=query,
-                n_results=3,
-                chunk_type="learning",
-            )
-
         if not results:
             return ""
 
@@ -106,8 +175,9 @@ class MedicalRetriever:
         n_results: int = 3,
     ) -> list[dict]:
         """Find cases similar to a given presentation text."""
-        results = self.vector_store.query(
+        results = self._query(
             query_text=presentation,
+            semantic=True,
             n_results=n_results,
             chunk_type="presentation",
         )
@@ -119,7 +189,8 @@ class MedicalRetriever:
         specialties = self.vector_store.get_specialties()
         return {
             "total_documents": total,
-            "total_cases": total // 3,  # 3 chunks per case
+            "total_cases": self.vector_store.count_cases(),
             "specialties": specialties,
             "status": "loaded" if total > 0 else "empty",
+            "embedding_cache": self.vector_store.embedding_cache_stats(),
         }
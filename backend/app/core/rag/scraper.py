@@ -1,14 +1,38 @@
 """Web scraper for medical corpus sources - JAPI, IJMR, and other open-access journals."""
 
-import json
+import asyncio
+import hashlib
 import logging
+import os
 import re
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.utils import fast_json
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - optional dependency
+    ahocorasick = None
+
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"  # C parser, several times faster than html.parser on journal pages
+except ImportError:  # pragma: no cover - optional dependency
+    HTML_PARSER = "html.parser"
 
 logger = logging.getLogger(__name__)
 
@@ -39,11 +63,78 @@ SOURCES = {
     },
 }
 
+# Seconds each fetch slot waits after a request, sync or async
+REQUEST_DELAY_SECONDS = 2
+# Concurrent article fetches per host for scrape_source_async
+ASYNC_CONCURRENCY = 5
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Clinical-Mind Research Bot; Educational Use)",
     "Accept": "text/html,application/xhtml+xml",
 }
 
+# Heading keywords per case field, in priority order
+SECTION_KEYWORDS = {
+    "presentation": ["presentation", "case report", "case description", "introduction"],
+    "history": ["history", "clinical history"],
+    "physical_exam": ["examination", "physical examination", "clinical examination"],
+    "investigations": ["investigations", "laboratory", "imaging", "results"],
+    "diagnosis": ["diagnosis", "final diagnosis", "discussion"],
+}
+
+# Compiled once at import; one pattern per keyword so the first keyword that matches wins
+SECTION_PATTERNS = {
+    field: [
+        re.compile(
+            rf"(?i)(?:^|\n)\s*{re.escape(keyword)}\s*[:\n](.+?)(?=\n\s*[A-Z][a-z]+\s*[:\n]|\Z)",
+            re.DOTALL,
+        )
+        for keyword in keywords
+    ]
+    for field, keywords in SECTION_KEYWORDS.items()
+}
+
+# Lowercase substrings that vote for a specialty; each keyword counts once per text
+SPECIALTY_KEYWORDS = {
+    "cardiology": ["cardiac", "heart", "coronary", "ecg", "myocardial", "arrhythmia", "valve"],
+    "respiratory": ["pulmonary", "lung", "pneumonia", "copd", "asthma", "tuberculosis", "respiratory"],
+    "infectious": ["infection", "fever", "malaria", "dengue", "hiv", "sepsis", "antibiotic"],
+    "neurology": ["brain", "stroke", "seizure", "neurological", "meningitis", "neuropathy"],
+    "gastro": ["liver", "hepat", "gastro", "pancrea", "intestin", "colon", "bowel"],
+    "emergency": ["emergency", "trauma", "poisoning", "resuscitation", "shock", "acute"],
+}
+
+
+def _build_specialty_automaton():
+    """Build one Aho-Corasick automaton over every specialty keyword, or None without pyahocorasick."""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for specialty, keywords in SPECIALTY_KEYWORDS.items():
+        for keyword in keywords:
+            automaton.add_word(keyword, (specialty, keyword))
+    automaton.make_automaton()
+    return automaton
+
+
+SPECIALTY_AUTOMATON = _build_specialty_automaton()
+
+# Pages per worker task when extracting PDF text; smaller PDFs are read in-process
+PDF_PAGES_PER_TASK = 16
+
+
+def _stable_id(text: str) -> str:
+    """8-hex-digit digest of text, identical across runs (unlike the salted built-in hash)."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=4).hexdigest()
+
+
+def _extract_pages_text(pdf_path: str, start: int, stop: int) -> list[str]:
+    """Extract text from pages [start, stop) of a PDF. Top-level so worker processes can pickle it."""
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages[start:stop]]
+
 
 class MedicalCorpusScraper:
     """Scrapes open-access medical journals for case reports and clinical data.
@@ -51,6 +142,8 @@ class MedicalCorpusScraper:
     Usage:
         scraper = MedicalCorpusScraper()
         cases = scraper.scrape_source("japi", max_articles=20)
+        # or, fetching several articles at once:
+        cases = asyncio.run(scraper.scrape_source_async("japi", max_articles=20))
         scraper.save_scraped_cases(cases, "japi_cases.json")
     """
 
@@ -59,6 +152,14 @@ class MedicalCorpusScraper:
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.session = requests.Session()
         self.session.headers.update(HEADERS)
+        # Keep connections to each journal host alive across articles and retry transient errors
+        adapter = HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=50,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def scrape_source(self, source_key: str, max_articles: int = 50) -> list[dict]:
         """Scrape case reports from a configured source."""
@@ -78,7 +179,7 @@ class MedicalCorpusScraper:
                 if case:
                     case["source"] = source["name"]
                     cases.append(case)
-                time.sleep(2)  # Respectful rate limiting
+                time.sleep(REQUEST_DELAY_SECONDS)  # Respectful rate limiting
 
             logger.info(f"Extracted {len(cases)} cases from {source['name']}")
             return cases
@@ -87,75 +188,137 @@ class MedicalCorpusScraper:
             logger.error(f"Error scraping {source_key}: {e}")
             return []
 
+    async def scrape_source_async(
+        self,
+        source_key: str,
+        max_articles: int = 50,
+        concurrency: int = ASYNC_CONCURRENCY,
+    ) -> list[dict]:
+        """Like scrape_source, but fetches up to `concurrency` articles at a time with aiohttp."""
+        if aiohttp is None:
+            logger.warning("aiohttp not installed, scraping sequentially. Run: pip install aiohttp")
+            return await asyncio.to_thread(self.scrape_source, source_key, max_articles)
+
+        if source_key not in SOURCES:
+            logger.error(f"Unknown source: {source_key}. Available: {list(SOURCES.keys())}")
+            return []
+
+        source = SOURCES[source_key]
+        logger.info(f"Scraping {source['name']} ({concurrency} concurrent fetches)...")
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def scrape_article(session, url: str) -> Optional[dict]:
+            async with semaphore:
+                try:
+                    html = await self._fetch_html(session, url)
+                    soup = await asyncio.to_thread(BeautifulSoup, html, HTML_PARSER)
+                    case = self._parse_case(soup, url, source)
+                except Exception as e:
+                    logger.error(f"Error extracting case from {url}: {e}")
+                    case = None
+                await asyncio.sleep(REQUEST_DELAY_SECONDS)  # Respectful rate limiting per slot
+            if case:
+                case["source"] = source["name"]
+            return case
+
+        url = f"{source['base_url']}{source['archive_path']}"
+        try:
+            async with aiohttp.ClientSession(
+                headers=HEADERS,
+                timeout=aiohttp.ClientTimeout(total=30),
+                # Every request goes to one journal host, so cache its DNS answer across fetches
+                connector=aiohttp.TCPConnector(limit_per_host=concurrency, ttl_dns_cache=300),
+            ) as session:
+                html = await self._fetch_html(session, url)
+                soup = await asyncio.to_thread(BeautifulSoup, html, HTML_PARSER)
+                articles = self._parse_article_links(soup, source, max_articles)
+                results = await asyncio.gather(*(scrape_article(session, a) for a in articles))
+        except Exception as e:
+            logger.error(f"Error scraping {source_key}: {e}")
+            return []
+
+        cases = [case for case in results if case]
+        logger.info(f"Extracted {len(cases)} cases from {source['name']}")
+        return cases
+
+    @staticmethod
+    async def _fetch_html(session, url: str) -> str:
+        """Fetch a page body with an aiohttp session."""
+        async with session.get(url) as resp:
+            resp.raise_for_status()
+            return await resp.text()
+
+    def _fetch_soup(self, url: str) -> BeautifulSoup:
+        """Fetch a page and parse it straight from the response stream."""
+        with self.session.get(url, timeout=30, stream=True) as resp:
+            resp.raise_for_status()
+            resp.raw.decode_content = True  # undo gzip/deflate transfer encoding
+            return BeautifulSoup(resp.raw, HTML_PARSER, from_encoding=resp.encoding)
+
     def _get_article_links(self, source: dict, max_articles: int) -> list[str]:
         """Extract article links from journal archive page."""
         url = f"{source['base_url']}{source['archive_path']}"
         try:
-            resp = self.session.get(url, timeout=30)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-
-            links = []
-            for a_tag in soup.select(source["article_selector"]):
-                href = a_tag.get("href", "")
-                if href and "case" in href.lower():
-                    full_url = href if href.startswith("http") else f"{source['base_url']}{href}"
-                    links.append(full_url)
-                if len(links) >= max_articles:
-                    break
-
-            return links
+            return self._parse_article_links(self._fetch_soup(url), source, max_articles)
         except Exception as e:
             logger.error(f"Error fetching article links from {url}: {e}")
             return []
 
+    @staticmethod
+    def _parse_article_links(soup: BeautifulSoup, source: dict, max_articles: int) -> list[str]:
+        """Pick case-report article links out of a parsed archive page."""
+        links = []
+        for a_tag in soup.select(source["article_selector"]):
+            href = a_tag.get("href", "")
+            if href and "case" in href.lower():
+                full_url = href if href.startswith("http") else f"{source['base_url']}{href}"
+                links.append(full_url)
+            if len(links) >= max_articles:
+                break
+        return links
+
     def _extract_case_from_article(self, url: str, source: dict) -> Optional[dict]:
         """Extract structured case data from an article page."""
         try:
-            resp = self.session.get(url, timeout=30)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-
-            title = soup.find("h1")
-            title_text = title.get_text(strip=True) if title else "Untitled"
+            return self._parse_case(self._fetch_soup(url), url, source)
+        except Exception as e:
+            logger.error(f"Error extracting case from {url}: {e}")
+            return None
 
-            content_div = soup.select_one(source["content_selector"])
-            if not content_div:
-                content_div = soup.find("article") or soup.find("main")
+    def _parse_case(self, soup: BeautifulSoup, url: str, source: dict) -> Optional[dict]:
+        """Build structured case data from a parsed article page."""
+        title = soup.find("h1")
+        title_text = title.get_text(strip=True) if title else "Untitled"
 
-            if not content_div:
-                return None
+        content_div = soup.select_one(source["content_selector"])
+        if not content_div:
+            content_div = soup.find("article") or soup.find("main")
 
-            full_text = content_div.get_text(separator="\n", strip=True)
+        if not content_div:
+            return None
 
-            # Try to parse structured sections
-            case = {
-                "id": f"SCRAPED-{hash(url) % 100000:05d}",
-                "title": title_text,
-                "url": url,
-                "full_text": full_text[:5000],  # Cap at 5000 chars
-                "specialty": self._detect_specialty(title_text + " " + full_text[:500]),
-                "difficulty": "intermediate",
-            }
+        full_text = content_div.get_text(separator="\n", strip=True)
 
-            # Extract sections if identifiable
-            case["presentation"] = self._extract_section(full_text, ["presentation", "case report", "case description", "introduction"])
-            case["history"] = self._extract_section(full_text, ["history", "clinical history"])
-            case["physical_exam"] = self._extract_section(full_text, ["examination", "physical examination", "clinical examination"])
-            case["investigations"] = self._extract_section(full_text, ["investigations", "laboratory", "imaging", "results"])
-            case["diagnosis"] = self._extract_section(full_text, ["diagnosis", "final diagnosis", "discussion"])
+        # Try to parse structured sections
+        case = {
+            "id": f"SCRAPED-{_stable_id(url)}",
+            "title": title_text,
+            "url": url,
+            "full_text": full_text[:5000],  # Cap at 5000 chars
+            "specialty": self._detect_specialty(title_text + " " + full_text[:500]),
+            "difficulty": "intermediate",
+        }
 
-            return case
+        # Extract sections if identifiable
+        for field in SECTION_PATTERNS:
+            case[field] = self._extract_section(full_text, field)
 
-        except Exception as e:
-            logger.error(f"Error extracting case from {url}: {e}")
-            return None
+        return case
 
-    def _extract_section(self, text: str, keywords: list[str]) -> str:
-        """Extract a section of text based on heading keywords."""
-        for keyword in keywords:
-            pattern = rf"(?i)(?:^|\n)\s*{keyword}\s*[:\n](.+?)(?=\n\s*[A-Z][a-z]+\s*[:\n]|\Z)"
-            match = re.search(pattern, text, re.DOTALL)
+    def _extract_section(self, text: str, field: str) -> str:
+        """Extract a section of text based on the field's heading keywords."""
+        for pattern in SECTION_PATTERNS[field]:
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()[:1000]
         return ""
@@ -163,18 +326,17 @@ class MedicalCorpusScraper:
     def _detect_specialty(self, text: str) -> str:
         """Auto-detect specialty from article text."""
         text_lower = text.lower()
-        specialty_keywords = {
-            "cardiology": ["cardiac", "heart", "coronary", "ecg", "myocardial", "arrhythmia", "valve"],
-            "respiratory": ["pulmonary", "lung", "pneumonia", "copd", "asthma", "tuberculosis", "respiratory"],
-            "infectious": ["infection", "fever", "malaria", "dengue", "hiv", "sepsis", "antibiotic"],
-            "neurology": ["brain", "stroke", "seizure", "neurological", "meningitis", "neuropathy"],
-            "gastro": ["liver", "hepat", "gastro", "pancrea", "intestin", "colon", "bowel"],
-            "emergency": ["emergency", "trauma", "poisoning", "resuscitation", "shock", "acute"],
-        }
 
-        scores = {}
-        for specialty, keywords in specialty_keywords.items():
-            scores[specialty] = sum(1 for kw in keywords if kw in text_lower)
+        if SPECIALTY_AUTOMATON is not None:
+            # One pass over the text; the set keeps repeated keywords from counting twice
+            scores = dict.fromkeys(SPECIALTY_KEYWORDS, 0)
+            for specialty, _ in {match for _, match in SPECIALTY_AUTOMATON.iter(text_lower)}:
+                scores[specialty] += 1
+        else:
+            scores = {
+                specialty: sum(1 for kw in keywords if kw in text_lower)
+                for specialty, keywords in SPECIALTY_KEYWORDS.items()
+            }
 
         if max(scores.values()) > 0:
             return max(scores, key=scores.get)
@@ -193,12 +355,24 @@ class MedicalCorpusScraper:
         # Return instructions for manual setup
         return []
 
-    def save_scraped_cases(self, cases: list[dict], filename: str):
-        """Save scraped cases to JSON file in corpus directory."""
+    def save_scraped_cases(self, cases: Iterable[dict], filename: str):
+        """Save scraped cases to the corpus directory.
+
+        A .jsonl filename gets one case per line, written as the cases arrive; any other
+        name gets a single indented JSON list.
+        """
         output_path = self.output_dir / filename
-        with open(output_path, "w") as f:
-            json.dump(cases, f, indent=2, ensure_ascii=False)
-        logger.info(f"Saved {len(cases)} cases to {output_path}")
+        if output_path.suffix == ".jsonl":
+            count = 0
+            with open(output_path, "wb") as f:
+                for case in cases:
+                    f.write(fast_json.dumps(case) + b"\n")
+                    count += 1
+        else:
+            cases = list(cases)
+            count = len(cases)
+            output_path.write_bytes(fast_json.dumps(cases, indent=True))
+        logger.info(f"Saved {count} cases to {output_path}")
 
     def ingest_pdf(self, pdf_path: str) -> list[dict]:
         """Extract case data from a PDF file (medical textbook or journal)."""
@@ -211,27 +385,43 @@ class MedicalCorpusScraper:
         cases = []
         try:
             with pdfplumber.open(pdf_path) as pdf:
-                full_text = ""
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n"
-
-                # Split into potential case boundaries
-                case_sections = re.split(r"(?i)\n(?:case\s+\d+|case\s+report|clinical\s+case)", full_text)
-
-                for i, section in enumerate(case_sections[1:], 1):  # Skip first (before any case)
-                    if len(section.strip()) < 100:
-                        continue
-                    case = {
-                        "id": f"PDF-{Path(pdf_path).stem}-{i:03d}",
-                        "title": f"Case {i} from {Path(pdf_path).name}",
-                        "full_text": section.strip()[:5000],
-                        "specialty": self._detect_specialty(section[:500]),
-                        "difficulty": "intermediate",
-                        "source": f"PDF: {Path(pdf_path).name}",
-                    }
-                    cases.append(case)
+                page_count = len(pdf.pages)
+                if page_count <= PDF_PAGES_PER_TASK:
+                    page_texts = [page.extract_text() or "" for page in pdf.pages]
+
+            if page_count > PDF_PAGES_PER_TASK:
+                # Layout/text extraction is CPU-bound pure Python, so split page ranges across processes
+                starts = range(0, page_count, PDF_PAGES_PER_TASK)
+                workers = min(len(starts), os.cpu_count() or 1)
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    page_texts = [
+                        text
+                        for chunk in executor.map(
+                            _extract_pages_text,
+                            [pdf_path] * len(starts),
+                            starts,
+                            [start + PDF_PAGES_PER_TASK for start in starts],
+                        )
+                        for text in chunk
+                    ]
+
+            full_text = "".join(text + "\n" for text in page_texts if text)
+
+            # Split into potential case boundaries
+            case_sections = re.split(r"(?i)\n(?:case\s+\d+|case\s+report|clinical\s+case)", full_text)
+
+            for i, section in enumerate(case_sections[1:], 1):  # Skip first (before any case)
+                if len(section.strip()) < 100:
+                    continue
+                case = {
+                    "id": f"PDF-{Path(pdf_path).stem}-{i:03d}",
+                    "title": f"Case {i} from {Path(pdf_path).name}",
+                    "full_text": section.strip()[:5000],
+                    "specialty": self._detect_specialty(section[:500]),
+                    "difficulty": "intermediate",
+                    "source": f"PDF: {Path(pdf_path).name}",
+                }
+                cases.append(case)
 
             logger.info(f"Extracted {len(cases)} cases from {pdf_path}")
         except Exception as e:
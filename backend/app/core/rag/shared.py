@@ -1,8 +1,23 @@
 """Shared singleton instances for the application."""
 
-from app.core.rag.generator import CaseGenerator
+from functools import cache
 
-# Create a single shared instance of CaseGenerator
-# This ensures both cases.py and agents.py use the same instance
-# and can share the active_cases dictionary
-case_generator = CaseGenerator()
\ No newline at end of file
+
+@cache
+def get_case_generator():
+    """Return the single shared CaseGenerator, creating it on first use.
+
+    Creating it opens ChromaDB and may ingest the corpus, so it is deferred until a request
+    needs it instead of running at import. cases.py, agents.py and the orchestrator all get
+    this same instance and so share the active_cases dictionary.
+    """
+    from app.core.rag.generator import CaseGenerator
+
+    return CaseGenerator()
+
+
+def __getattr__(name: str):
+    # Keeps `from app.core.rag.shared import case_generator` working
+    if name == "case_generator":
+        return get_case_generator()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
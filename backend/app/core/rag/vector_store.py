@@ -1,194 +1,702 @@
 """ChromaDB vector store for medical case corpus."""
 
 import os
-import json
+import sys
+import hashlib
 import logging
+import mmap
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, NamedTuple, Optional
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings
 
+from app.utils import fast_json
+
 logger = logging.getLogger(__name__)
 
 CORPUS_DIR = Path(__file__).resolve().parent.parent.parent.parent / "data" / "medical_corpus"
 DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent.parent.parent / "data" / "vector_db"
 
+# "persistent" embeds ChromaDB in this process; "http" talks to a separate Chroma server
+# (e.g. a sidecar started with `chroma run --port 8001`) so its storage writes happen off our GIL
+CHROMA_MODE = os.environ.get("CHROMA_MODE", "persistent").lower()
+CHROMA_HOST = os.environ.get("CHROMA_HOST", "localhost")
+CHROMA_PORT = int(os.environ.get("CHROMA_PORT", "8001"))
+
 COLLECTION_NAME = "medical_cases"
+EVALUATION_CACHE_NAME = "evaluation_cache"
+
+# HNSW index parameters for the case collection, tunable without code changes. Chroma fixes
+# them when a collection is created, so changes take effect after `ingest --reset`.
+COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": int(os.environ.get("HNSW_M", "16")),
+    "hnsw:construction_ef": int(os.environ.get("HNSW_CONSTRUCTION_EF", "200")),
+    "hnsw:search_ef": int(os.environ.get("HNSW_SEARCH_EF", "64")),
+    "hnsw:num_threads": int(os.environ.get("HNSW_NUM_THREADS", str(max(1, (os.cpu_count() or 2) // 2)))),
+}
+
+# Max cosine distance between student reasonings for a cached evaluation of the same diagnosis to be reused (similarity > 0.92)
+EVALUATION_CACHE_MAX_DISTANCE = 0.08
+
+# Optional case fields included in the full narrative chunk, with their labels
+NARRATIVE_FIELDS = [
+    (field, field.replace("_", " ").title())
+    for field in ["chief_complaint", "presentation", "history", "physical_exam", "investigations"]
+]
+
+# Chunks per collection.add call during ingest
+INGEST_BATCH_SIZE = 200
+# Cases parsed from a .jsonl corpus file before they are handed on for chunking
+JSONL_GROUP_SIZE = 100
+# Processes that parse and chunk corpus files during ingest; 0 keeps it in this process,
+# which is faster for the seed corpus than starting a pool
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "0"))
+
+# Same model as ChromaDB's default embedding function, so vectors stay comparable with
+# collections embedded before embeddings were computed here
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Torch device for the embedder ("cuda", "cpu", "mps"); unset lets sentence-transformers pick
+EMBEDDING_DEVICE = os.environ.get("EMBEDDING_DEVICE") or None
+# Texts per encode() forward pass; GPUs stay busy with larger batches, CPUs gain nothing from them
+EMBEDDING_BATCH_SIZE = 64
+GPU_EMBEDDING_BATCH_SIZE = 256
+# Chunk embeddings kept on disk by content hash, so re-ingesting unchanged text (e.g. after
+# `ingest --reset`) skips the model. Defaults to a file beside the Chroma directory; "off" disables.
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "")
+# Keys per SQLite IN (...) lookup, well under the host-parameter limit
+EMBEDDING_CACHE_LOOKUP_SIZE = 500
+# Query strings whose embeddings are kept in memory (retriever queries repeat per specialty/difficulty)
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+# Seconds the locally tracked document count is trusted before re-asking Chroma, which picks
+# up writes from other processes (the ingest CLI, or any client of a shared HTTP server)
+COUNT_REFRESH_SECONDS = 30
+
+
+@dataclass
+class IngestStats:
+    """What one ingest_corpus call added to the collection."""
+    chunks: int = 0
+    cases: int = 0
+    specialties: set[str] = field(default_factory=set)
+
+
+def _load_case_file(path: Path) -> list[dict]:
+    """Parse one corpus JSON file straight from a read-only memory map, without copying it into bytes."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap can't map an empty file; parsing empty input raises the usual JSONDecodeError
+            return fast_json.loads(b"")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            return fast_json.loads(view)
+
+
+def _iter_jsonl_cases(path: Path, group_size: int = JSONL_GROUP_SIZE) -> Iterator[list[dict]]:
+    """Yield a JSONL file's cases (one JSON object per line) in groups, reading it line by line."""
+    group = []
+    with open(path, "rb") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                group.append(fast_json.loads(line))
+            except fast_json.JSONDecodeError as e:
+                logger.error(f"Skipping line {line_no} of {path.name}: {e}")
+                continue
+            if len(group) >= group_size:
+                yield group
+                group = []
+    if group:
+        yield group
+
+
+def iter_corpus_files(corpus_path: Path = CORPUS_DIR) -> Iterator[list[dict]]:
+    """Yield the cases of every corpus file in name order, as one or more lists per file.
+
+    A .json file holds a list of cases and is parsed whole; the next one is read on a worker
+    thread while the caller handles the current one (encode() and Chroma writes release the
+    GIL). A .jsonl file holds one case per line and is streamed in groups of JSONL_GROUP_SIZE.
+    """
+    for _, cases in _iter_corpus_groups(corpus_path):
+        yield cases
+
+
+def _iter_corpus_groups(corpus_path: Path) -> Iterator[tuple[Path, list[dict]]]:
+    """iter_corpus_files, with each group of cases paired with the file it came from."""
+    paths = sorted(p for p in corpus_path.iterdir() if p.suffix in (".json", ".jsonl"))
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="corpus-reader") as reader:
+
+        def read_ahead(i: int):
+            if i < len(paths) and paths[i].suffix == ".json":
+                return reader.submit(_load_case_file, paths[i])
+            return None
+
+        next_load = read_ahead(0)
+        for i, path in enumerate(paths):
+            load, next_load = next_load, read_ahead(i + 1)
+            if load is None:
+                total = 0
+                try:
+                    for cases in _iter_jsonl_cases(path):
+                        total += len(cases)
+                        yield path, cases
+                except OSError as e:
+                    logger.error(f"Error reading corpus file {path.name}: {e}")
+                logger.info(f"Streamed {total} cases from {path.name}")
+                continue
+            try:
+                cases = load.result()
+            except Exception as e:
+                logger.error(f"Error reading corpus file {path.name}: {e}")
+                continue
+            logger.info(f"Loaded {len(cases)} cases from {path.name}")
+            yield path, cases
+
+
+def _case_to_chunks(case: dict) -> tuple[str, str, str]:
+    """Build the full narrative, presentation and learning chunk texts for a case in one pass.
+
+    - full narrative: primary retrieval document
+    - presentation: symptom-based retrieval
+    - learning: diagnosis and teaching points for educational retrieval
+    """
+    get = case.get
+    title = get("title", "")
+    specialty = get("specialty", "")
+    diagnosis = get("diagnosis", "")
+    differentials = get("differentials")
+    learning_points = get("learning_points")
+    india_context = get("india_context")
+
+    demographics = get("demographics", {})
+    demographics_line = (
+        f"{demographics.get('age', '')} year old {demographics.get('gender', '')} from {demographics.get('location', '')}"
+        if demographics
+        else None
+    )
+    vs = get("vital_signs")
+    vitals_line = (
+        f"Vital Signs: BP {vs.get('bp', 'N/A')}, HR {vs.get('hr', 'N/A')}, RR {vs.get('rr', 'N/A')}, Temp {vs.get('temp', 'N/A')}°C, SpO2 {vs.get('spo2', 'N/A')}%"
+        if vs
+        else None
+    )
+    differentials_line = f"Differential Diagnoses: {', '.join(differentials)}" if differentials else None
+    india_line = f"Indian Context: {india_context}" if india_context else None
+
+    narrative = [
+        f"Clinical Case: {get('title', 'Untitled')}",
+        f"Specialty: {specialty} | Difficulty: {get('difficulty', '')}",
+        f"Source: {get('source', '')}",
+    ]
+    if demographics_line:
+        narrative.append(f"Patient: {demographics_line}")
+    for field, label in NARRATIVE_FIELDS:
+        value = get(field)
+        if value:
+            narrative.append(f"{label}: {value}")
+    if vitals_line:
+        narrative.append(vitals_line)
+    narrative.append(f"Diagnosis: {diagnosis}")
+    if differentials_line:
+        narrative.append(differentials_line)
+    if learning_points:
+        narrative.append("Key Learning Points: " + " | ".join(learning_points))
+    if india_line:
+        narrative.append(india_line)
+
+    presentation = [f"Patient Presentation: {title}"]
+    if demographics_line:
+        presentation.append(demographics_line)
+    presentation.append(f"Chief Complaint: {get('chief_complaint', '')}")
+    presentation.append(f"Presentation: {get('presentation', '')}")
+    if vitals_line:
+        presentation.append(vitals_line)
+    presentation.append(f"History: {get('history', '')}")
+    presentation.append(f"Physical Examination: {get('physical_exam', '')}")
+
+    learning = [
+        f"Diagnosis and Teaching Points: {title}",
+        f"Specialty: {specialty}",
+        f"Final Diagnosis: {diagnosis}",
+    ]
+    if differentials_line:
+        learning.append(differentials_line)
+    if learning_points:
+        learning.append("Learning Points:")
+        learning.extend(f"  {i}. {point}" for i, point in enumerate(learning_points, 1))
+    if get("atypical_features"):
+        learning.append(f"Atypical Features: {case['atypical_features']}")
+    if india_line:
+        learning.append(india_line)
+
+    return "\n\n".join(narrative), "\n\n".join(presentation), "\n\n".join(learning)
+
+
+class ChunkedCase(NamedTuple):
+    """One case reduced to what ingest stores: its metadata fields and three chunk texts."""
+    case_id: str
+    specialty: str
+    difficulty: str
+    title: str
+    source: str
+    full_text: str
+    presentation_text: str
+    learning_text: str
+
+
+def _chunk_cases(cases: list[dict]) -> list[ChunkedCase]:
+    """Build the ingest chunks for a group of cases."""
+    return [
+        ChunkedCase(
+            case.get("id", "UNKNOWN"),
+            case.get("specialty", ""),
+            case.get("difficulty", ""),
+            case.get("title", ""),
+            case.get("source", ""),
+            *_case_to_chunks(case),
+        )
+        for case in cases
+    ]
+
+
+def _parse_and_chunk_file(path: Path) -> tuple[list[list[ChunkedCase]], Optional[str]]:
+    """Process pool worker: parse one corpus file and chunk its cases, grouped as iter_corpus_files would.
+
+    Returns the groups chunked before any failure, plus the error message if the rest of the
+    file had to be skipped, so the parent logs it and keeps going like the in-process path.
+    """
+    groups = []
+    try:
+        if path.suffix == ".jsonl":
+            for cases in _iter_jsonl_cases(path):
+                groups.append(_chunk_cases(cases))
+        else:
+            groups.append(_chunk_cases(_load_case_file(path)))
+    except Exception as e:
+        return groups, str(e)
+    return groups, None
+
+
+def iter_chunked_corpus_files(corpus_path: Path = CORPUS_DIR, workers: int = 0) -> Iterator[list[ChunkedCase]]:
+    """Yield every corpus file's cases as ingest chunks, in name order.
+
+    With workers > 0, files are parsed and chunked in that many processes (both are pure
+    Python and hold the GIL), at most two files per worker ahead of the caller. Otherwise
+    chunking happens in this process on top of iter_corpus_files.
+    """
+    if workers <= 0:
+        failed = None
+        for path, cases in _iter_corpus_groups(corpus_path):
+            if path == failed:
+                continue
+            try:
+                chunked = _chunk_cases(cases)
+            except Exception as e:
+                # Skip the rest of this file (a malformed case, say) but keep ingesting the others
+                logger.error(f"Error reading corpus file {path.name}: {e}")
+                failed = path
+                continue
+            yield chunked
+        return
+
+    paths = sorted(p for p in corpus_path.iterdir() if p.suffix in (".json", ".jsonl"))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        remaining = iter(paths)
+        for path in islice(remaining, workers * 2):
+            in_flight.append((path, pool.submit(_parse_and_chunk_file, path)))
+        while in_flight:
+            path, future = in_flight.popleft()
+            for next_path in islice(remaining, 1):
+                in_flight.append((next_path, pool.submit(_parse_and_chunk_file, next_path)))
+            try:
+                groups, error = future.result()
+            except Exception as e:
+                logger.error(f"Error reading corpus file {path.name}: {e}")
+                continue
+            if error:
+                logger.error(f"Error reading corpus file {path.name}: {error}")
+            else:
+                logger.info(f"Loaded {sum(len(g) for g in groups)} cases from {path.name}")
+            yield from groups
 
 
 class MedicalVectorStore:
     """Manages ChromaDB vector store for medical case embeddings."""
 
-    def __init__(self, db_path: Optional[str] = None):
-        self.db_path = db_path or os.environ.get("CHROMA_DB_PATH", str(DEFAULT_DB_PATH))
-        Path(self.db_path).mkdir(parents=True, exist_ok=True)
+    # One SentenceTransformer per process, loaded on first use and shared by every instance
+    _shared_embedder = None
+    _embedder_loaded = False
+    _embedder_lock = threading.Lock()
 
-        self.client = chromadb.PersistentClient(
-            path=self.db_path,
-            settings=Settings(anonymized_telemetry=False),
-        )
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        load_embedder: bool = True,
+        persist_query_embeddings: bool = False,
+    ):
+        """Open the store. load_embedder=False skips the embedding model, for count/metadata-only use.
+
+        persist_query_embeddings=True also keeps query embeddings in the on-disk cache, for
+        short-lived processes (the `ingest --query` CLI) whose in-memory LRU starts empty.
+        """
+        self.db_path = db_path or os.environ.get("CHROMA_DB_PATH", str(DEFAULT_DB_PATH))
+        self.client = self._create_client(self.db_path)
         self.collection = self.client.get_or_create_collection(
             name=COLLECTION_NAME,
+            metadata=COLLECTION_METADATA,
+        )
+        self.evaluation_cache = self.client.get_or_create_collection(
+            name=EVALUATION_CACHE_NAME,
             metadata={"hnsw:space": "cosine"},
         )
-        logger.info(f"ChromaDB initialized at {self.db_path}, collection has {self.collection.count()} documents")
+        # The model itself is loaded on first embed (or by prewarm_embedder), not here
+        self._use_embedder = load_embedder
+        self._embedding_db_lock = threading.Lock()
+        self._embedding_db = self._open_embedding_cache() if load_embedder else None
+        self._persist_query_embeddings = persist_query_embeddings
+        self._query_embeddings: OrderedDict[str, list[float]] = OrderedDict()
+        self._query_embedding_lock = threading.Lock()
+        self._query_embedding_hits = 0
+        self._query_embedding_misses = 0
+        # Bumped on every write/reset so callers can invalidate cached query results
+        self.generation = 0
+        # Totals for the most recent ingest_corpus call
+        self.last_ingest = IngestStats()
+        # Running document count, kept in step by _add_batch and reset, and re-read from Chroma
+        # by count() when zero or older than COUNT_REFRESH_SECONDS
+        self._count = self.collection.count()
+        self._count_checked_at = time.monotonic()
+        # (generation, value) pair; stale once generation moves on. An empty collection starts it
+        # off current, so _add_batch keeps it up to date through a first ingest.
+        self._specialties_cache: Optional[tuple[int, list[str]]] = (0, []) if self._count == 0 else None
+        # (generation, number of cases), i.e. of full_narrative chunks; kept like the specialty cache
+        self._case_count_cache: Optional[tuple[int, int]] = (0, 0) if self._count == 0 else None
+        logger.info(f"ChromaDB initialized at {self.db_path}, collection has {self._count} documents")
+
+    @staticmethod
+    def _create_client(db_path: str):
+        """Open the in-process persistent client, or connect to a Chroma server when CHROMA_MODE=http."""
+        if CHROMA_MODE == "http":
+            logger.info(f"Connecting to ChromaDB server at {CHROMA_HOST}:{CHROMA_PORT}")
+            return chromadb.HttpClient(
+                host=CHROMA_HOST,
+                port=CHROMA_PORT,
+                settings=Settings(anonymized_telemetry=False),
+            )
+
+        Path(db_path).mkdir(parents=True, exist_ok=True)
+        return chromadb.PersistentClient(
+            path=db_path,
+            settings=Settings(anonymized_telemetry=False),
+        )
 
-    def ingest_corpus(self, corpus_dir: Optional[str] = None) -> int:
-        """Load all JSON case files from corpus directory, chunk, and embed into ChromaDB."""
+    def ingest_corpus(
+        self,
+        corpus_dir: Optional[str] = None,
+        batch_size: int = INGEST_BATCH_SIZE,
+        workers: int = INGEST_WORKERS,
+    ) -> int:
+        """Stream the corpus directory's case files into ChromaDB, chunking and embedding per batch.
+
+        With workers > 0, parsing and chunking run in a process pool; embedding and Chroma
+        writes stay in this process.
+
+        Returns the number of chunks added; last_ingest has that plus the cases and specialties
+        they came from.
+        """
+        self.last_ingest = IngestStats()
         corpus_path = Path(corpus_dir) if corpus_dir else CORPUS_DIR
         if not corpus_path.exists():
             logger.warning(f"Corpus directory not found: {corpus_path}")
             return 0
 
-        total_added = 0
-        for json_file in sorted(corpus_path.glob("*.json")):
-            try:
-                with open(json_file, "r") as f:
-                    cases = json.load(f)
-                added = self._ingest_cases(cases)
-                total_added += added
-                logger.info(f"Ingested {added} chunks from {json_file.name}")
-            except Exception as e:
-                logger.error(f"Error ingesting {json_file.name}: {e}")
+        count_before = self._count
+        try:
+            self._ingest_cases(iter_chunked_corpus_files(corpus_path, workers), batch_size)
+        except Exception as e:
+            logger.error(f"Error adding corpus chunks to ChromaDB: {e}")
+        # Batches written before a failure stay in the collection, so count them either way
+        total_added = self.last_ingest.chunks = self._count - count_before
 
-        logger.info(f"Total documents in collection: {self.collection.count()}")
+        logger.info(f"Total documents in collection: {self._count}")
         return total_added
 
-    def _ingest_cases(self, cases: list[dict]) -> int:
-        """Convert structured cases into text chunks and add to ChromaDB."""
+    def _ingest_cases(self, case_groups: Iterable[list[ChunkedCase]], batch_size: int = INGEST_BATCH_SIZE) -> int:
+        """Add groups of chunked cases to ChromaDB in batches of ~batch_size.
+
+        Batches fill across group boundaries, so small files don't each cost a partial write.
+        """
+        existing: set[str] = set()
         ids = []
         documents = []
         metadatas = []
+        total_added = 0
+        pending_cases = 0
+
+        for cases in case_groups:
+            # One roundtrip per group to find cases that are already ingested
+            expected_ids = [f"{case.case_id}_full" for case in cases]
+            if expected_ids:
+                existing.update(self.collection.get(ids=expected_ids, include=[])["ids"])
+
+            for case in cases:
+                case_id = case.case_id
+
+                # Skip if already in collection (or seen earlier in this ingest)
+                if f"{case_id}_full" in existing:
+                    continue
+                existing.add(f"{case_id}_full")
+                # Shared by all three chunks' metadata (and by every case of the same specialty)
+                specialty = sys.intern(case.specialty)
+                difficulty = sys.intern(case.difficulty)
+
+                # Chunk 1: Full case narrative (primary retrieval document)
+                ids.append(f"{case_id}_full")
+                documents.append(case.full_text)
+                metadatas.append({
+                    "case_id": case_id,
+                    "specialty": specialty,
+                    "difficulty": difficulty,
+                    "chunk_type": "full_narrative",
+                    "title": case.title,
+                    "source": case.source,
+                })
 
-        for case in cases:
-            case_id = case.get("id", "UNKNOWN")
-
-            # Skip if already in collection
-            existing = self.collection.get(ids=[f"{case_id}_full"])
-            if existing and existing["ids"]:
-                continue
-
-            # Chunk 1: Full case narrative (primary retrieval document)
-            full_text = self._case_to_narrative(case)
-            ids.append(f"{case_id}_full")
-            documents.append(full_text)
-            metadatas.append({
-                "case_id": case_id,
-                "specialty": case.get("specialty", ""),
-                "difficulty": case.get("difficulty", ""),
-                "chunk_type": "full_narrative",
-                "title": case.get("title", ""),
-                "source": case.get("source", ""),
-            })
-
-            # Chunk 2: Clinical presentation (for symptom-based retrieval)
-            presentation_text = self._case_to_presentation(case)
-            ids.append(f"{case_id}_presentation")
-            documents.append(presentation_text)
-            metadatas.append({
-                "case_id": case_id,
-                "specialty": case.get("specialty", ""),
-                "difficulty": case.get("difficulty", ""),
-                "chunk_type": "presentation",
-                "title": case.get("title", ""),
-            })
-
-            # Chunk 3: Diagnosis and learning points (for educational retrieval)
-            learning_text = self._case_to_learning(case)
-            ids.append(f"{case_id}_learning")
-            documents.append(learning_text)
-            metadatas.append({
-                "case_id": case_id,
-                "specialty": case.get("specialty", ""),
-                "difficulty": case.get("difficulty", ""),
-                "chunk_type": "learning",
-                "title": case.get("title", ""),
-            })
-
-        if ids:
-            self.collection.add(ids=ids, documents=documents, metadatas=metadatas)
-
-        return len(ids)
-
-    def _case_to_narrative(self, case: dict) -> str:
-        """Convert a structured case to a full narrative text chunk for embedding."""
-        parts = [
-            f"Clinical Case: {case.get('title', 'Untitled')}",
-            f"Specialty: {case.get('specialty', '')} | Difficulty: {case.get('difficulty', '')}",
-            f"Source: {case.get('source', '')}",
-        ]
-
-        demographics = case.get("demographics", {})
-        if demographics:
-            parts.append(f"Patient: {demographics.get('age', '')} year old {demographics.get('gender', '')} from {demographics.get('location', '')}")
-
-        for field in ["chief_complaint", "presentation", "history", "physical_exam", "investigations"]:
-            if case.get(field):
-                label = field.replace("_", " ").title()
-                parts.append(f"{label}: {case[field]}")
-
-        if case.get("vital_signs"):
-            vs = case["vital_signs"]
-            parts.append(f"Vital Signs: BP {vs.get('bp', 'N/A')}, HR {vs.get('hr', 'N/A')}, RR {vs.get('rr', 'N/A')}, Temp {vs.get('temp', 'N/A')}°C, SpO2 {vs.get('spo2', 'N/A')}%")
-
-        parts.append(f"Diagnosis: {case.get('diagnosis', '')}")
-
-        if case.get("differentials"):
-            parts.append(f"Differential Diagnoses: {', '.join(case['differentials'])}")
-
-        if case.get("learning_points"):
-            parts.append("Key Learning Points: " + " | ".join(case["learning_points"]))
-
-        if case.get("india_context"):
-            parts.append(f"Indian Context: {case['india_context']}")
-
-        return "\n\n".join(parts)
+                # Chunks 2 and 3 carry no title/source; get_titles looks them up on the _full chunk
+                # Chunk 2: Clinical presentation (for symptom-based retrieval)
+                ids.append(f"{case_id}_presentation")
+                documents.append(case.presentation_text)
+                metadatas.append({
+                    "case_id": case_id,
+                    "specialty": specialty,
+                    "difficulty": difficulty,
+                    "chunk_type": "presentation",
+                })
 
-    def _case_to_presentation(self, case: dict) -> str:
-        """Extract presentation-focused chunk for symptom-based retrieval."""
-        parts = [
-            f"Patient Presentation: {case.get('title', '')}",
-        ]
-        demographics = case.get("demographics", {})
-        if demographics:
-            parts.append(f"{demographics.get('age', '')} year old {demographics.get('gender', '')} from {demographics.get('location', '')}")
+                # Chunk 3: Diagnosis and learning points (for educational retrieval)
+                ids.append(f"{case_id}_learning")
+                documents.append(case.learning_text)
+                metadatas.append({
+                    "case_id": case_id,
+                    "specialty": specialty,
+                    "difficulty": difficulty,
+                    "chunk_type": "learning",
+                })
 
-        parts.append(f"Chief Complaint: {case.get('chief_complaint', '')}")
-        parts.append(f"Presentation: {case.get('presentation', '')}")
+                pending_cases += 1
 
-        if case.get("vital_signs"):
-            vs = case["vital_signs"]
-            parts.append(f"Vital Signs: BP {vs.get('bp', 'N/A')}, HR {vs.get('hr', 'N/A')}, RR {vs.get('rr', 'N/A')}, Temp {vs.get('temp', 'N/A')}°C, SpO2 {vs.get('spo2', 'N/A')}%")
+                if len(ids) >= batch_size:
+                    self.last_ingest.specialties |= self._add_batch(ids, documents, metadatas)
+                    total_added += len(ids)
+                    self.last_ingest.cases += pending_cases
+                    ids, documents, metadatas = [], [], []
+                    pending_cases = 0
 
-        parts.append(f"History: {case.get('history', '')}")
-        parts.append(f"Physical Examination: {case.get('physical_exam', '')}")
+        if ids:
+            self.last_ingest.specialties |= self._add_batch(ids, documents, metadatas)
+            total_added += len(ids)
+            self.last_ingest.cases += pending_cases
 
-        return "\n\n".join(parts)
+        return total_added
 
-    def _case_to_learning(self, case: dict) -> str:
-        """Extract learning-focused chunk for educational retrieval."""
-        parts = [
-            f"Diagnosis and Teaching Points: {case.get('title', '')}",
-            f"Specialty: {case.get('specialty', '')}",
-            f"Final Diagnosis: {case.get('diagnosis', '')}",
+    def _add_batch(self, ids: list[str], documents: list[str], metadatas: list[dict]) -> set[str]:
+        """Add one batch of chunks, passing precomputed embeddings when available.
+
+        Returns the batch's specialties, which also extend the specialty cache if it was current
+        (likewise the case count).
+        """
+        cached = self._specialties_cache
+        cache_current = cached is not None and cached[0] == self.generation
+        cached_cases = self._case_count_cache
+        cases_current = cached_cases is not None and cached_cases[0] == self.generation
+        self.collection.add(
+            ids=ids,
+            documents=documents,
+            embeddings=self.embed_documents(documents),
+            metadatas=metadatas,
+        )
+        self._count += len(ids)
+        self.generation += 1
+
+        specialties = {
+            m["specialty"] for m in metadatas if m.get("chunk_type") == "full_narrative" and m.get("specialty")
+        }
+        if cache_current:
+            # Same answer get_specialties would rebuild from every chunk's metadata
+            self._specialties_cache = (self.generation, sorted(set(cached[1]) | specialties))
+        if cases_current:
+            new_cases = sum(1 for m in metadatas if m.get("chunk_type") == "full_narrative")
+            self._case_count_cache = (self.generation, cached_cases[1] + new_cases)
+        return specialties
+
+    def _open_embedding_cache(self) -> Optional[sqlite3.Connection]:
+        """Open (creating if needed) the on-disk chunk embedding cache; None if disabled or unavailable."""
+        if EMBEDDING_CACHE_PATH.lower() == "off":
+            return None
+        if EMBEDDING_CACHE_PATH:
+            path = Path(EMBEDDING_CACHE_PATH)
+        else:
+            path = Path(self.db_path).parent / "embedding_cache.sqlite"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB)")
+            db.commit()
+            return db
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache unavailable at {path}: {e}")
+            return None
+
+    @staticmethod
+    def _embedding_key(text: str) -> bytes:
+        """Content hash of a chunk, scoped to the embedding model so a model change never reuses vectors."""
+        return hashlib.blake2b(f"{EMBEDDING_MODEL}\0{text}".encode(), digest_size=16).digest()
+
+    def embed_documents(self, texts: list[str]) -> Optional[list[list[float]]]:
+        """Like embed(), but runs the model once per distinct text, reusing vectors cached on disk."""
+        keys = [self._embedding_key(text) for text in texts]
+        cached: dict[bytes, bytes] = {}
+        if self._embedding_db is not None:
+            try:
+                with self._embedding_db_lock:
+                    for start in range(0, len(keys), EMBEDDING_CACHE_LOOKUP_SIZE):
+                        chunk = keys[start:start + EMBEDDING_CACHE_LOOKUP_SIZE]
+                        placeholders = ",".join("?" * len(chunk))
+                        cached.update(self._embedding_db.execute(
+                            f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                        ))
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache read failed, embedding the whole batch: {e}")
+
+        # Boilerplate repeated across cases (headers, disclaimers) shares a key, so embed it once
+        pending: dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                pending.setdefault(key, text)
+        fresh: dict[bytes, list[float]] = {}
+        if pending:
+            vectors = self.embed(list(pending.values()))
+            if vectors is None:
+                # No local model; let Chroma embed the whole batch so every vector comes from one source
+                return None
+            fresh = dict(zip(pending, vectors))
+            if self._embedding_db is not None:
+                try:
+                    with self._embedding_db_lock:
+                        self._embedding_db.executemany(
+                            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                            [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in fresh.items()],
+                        )
+                        self._embedding_db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Embedding cache write failed: {e}")
+        logger.debug(
+            f"Embedded {len(fresh)} distinct of {len(texts)} chunks, {len(texts) - len(fresh)} from cache or duplicates"
+        )
+        return [
+            fresh[key] if key in fresh else np.frombuffer(cached[key], dtype=np.float32).tolist()
+            for key in keys
         ]
 
-        if case.get("differentials"):
-            parts.append(f"Differential Diagnoses: {', '.join(case['differentials'])}")
-
-        if case.get("learning_points"):
-            parts.append("Learning Points:")
-            for i, point in enumerate(case["learning_points"], 1):
-                parts.append(f"  {i}. {point}")
-
-        if case.get("atypical_features"):
-            parts.append(f"Atypical Features: {case['atypical_features']}")
-
-        if case.get("india_context"):
-            parts.append(f"Indian Context: {case['india_context']}")
-
-        return "\n\n".join(parts)
+    @property
+    def _embedder(self):
+        """The shared embedding model, or None when disabled for this store or unavailable."""
+        return self._load_embedder() if self._use_embedder else None
+
+    @classmethod
+    def prewarm_embedder(cls) -> threading.Thread:
+        """Start loading the embedding model on a background thread; the first embed waits for it."""
+        thread = threading.Thread(target=cls._load_embedder, name="embedder-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    @classmethod
+    def _load_embedder(cls):
+        """Load the SentenceTransformer model once per process; None falls back to ChromaDB's embedder."""
+        if cls._embedder_loaded:
+            return cls._shared_embedder
+        with cls._embedder_lock:
+            if not cls._embedder_loaded:
+                cls._shared_embedder = cls._create_embedder()
+                cls._embedder_loaded = True
+        return cls._shared_embedder
+
+    @staticmethod
+    def _create_embedder():
+        """Build the SentenceTransformer, or None if it is not installed or fails to load."""
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            logger.info("sentence-transformers not installed, using ChromaDB default embeddings")
+            return None
+        try:
+            # device=None picks CUDA automatically when available
+            embedder = SentenceTransformer(EMBEDDING_MODEL, device=EMBEDDING_DEVICE)
+            logger.info(f"Embedding model {EMBEDDING_MODEL} loaded on {embedder.device}")
+            return embedder
+        except Exception as e:
+            logger.warning(f"Failed to load embedding model {EMBEDDING_MODEL}: {e}")
+            return None
+
+    def embed(self, texts: list[str]) -> Optional[list[list[float]]]:
+        """Batch-encode texts into unit-norm vectors, or None if no local embedder is loaded."""
+        embedder = self._embedder
+        if embedder is None:
+            return None
+        return embedder.encode(
+            texts,
+            batch_size=GPU_EMBEDDING_BATCH_SIZE if embedder.device.type == "cuda" else EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        ).tolist()
+
+    def embed_query(self, text: str) -> Optional[list[float]]:
+        """Embed one query string, reusing the vector from an LRU cache when the text repeats.
+
+        Only with persist_query_embeddings do misses go through the on-disk embedding cache;
+        request-path queries (and student reasoning) stay in memory, off the disk table.
+        """
+        with self._query_embedding_lock:
+            cached = self._query_embeddings.get(text)
+            if cached is not None:
+                self._query_embeddings.move_to_end(text)
+                self._query_embedding_hits += 1
+                return cached
+
+        if self._persist_query_embeddings:
+            embeddings = self.embed_documents([text])
+        else:
+            embeddings = self.embed([text])
+        if embeddings is None:
+            return None
+
+        with self._query_embedding_lock:
+            self._query_embedding_misses += 1
+            self._query_embeddings[text] = embeddings[0]
+            while len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+        return embeddings[0]
+
+    def embedding_cache_stats(self) -> dict:
+        """Hit/miss counts and size of the query embedding cache."""
+        with self._query_embedding_lock:
+            return {
+                "size": len(self._query_embeddings),
+                "hits": self._query_embedding_hits,
+                "misses": self._query_embedding_misses,
+            }
 
     def query(
         self,
@@ -197,8 +705,37 @@ class MedicalVectorStore:
         difficulty: Optional[str] = None,
         n_results: int = 5,
         chunk_type: Optional[str] = None,
+        include: Optional[list[str]] = None,
+        query_embedding: Optional[list[float]] = None,
+        prefer_specialty: bool = False,
     ) -> list[dict]:
-        """Query the vector store for relevant medical cases."""
+        """Query the vector store for relevant medical cases.
+
+        `include` narrows what Chroma returns (e.g. ["metadatas"]); fields left out come
+        back as "" content, {} metadata, or a None relevance_score. Pass `query_embedding`
+        when the caller has already embedded `query_text`.
+
+        With `prefer_specialty`, the specialty-filtered search comes first; only when the
+        specialty has fewer than n_results matches are the rest filled from an unfiltered search.
+        """
+        total = self.count()
+        if total == 0:
+            return []
+
+        if specialty and prefer_specialty:
+            query_embedding = query_embedding or self.embed_query(query_text)
+            shared = dict(
+                query_text=query_text, difficulty=difficulty, chunk_type=chunk_type,
+                include=include, query_embedding=query_embedding,
+            )
+            documents = self.query(specialty=specialty, n_results=n_results, **shared)
+            if len(documents) < n_results:
+                # The specialty has run out of matches; pad with the best hits from any specialty
+                seen = {d["id"] for d in documents}
+                others = self.query(n_results=n_results + len(documents), **shared)
+                documents += [d for d in others if d["id"] not in seen][:n_results - len(documents)]
+            return documents
+
         where_filter = {}
         conditions = []
 
@@ -215,25 +752,42 @@ class MedicalVectorStore:
             where_filter = conditions[0]
 
         try:
+            query_embedding = query_embedding or self.embed_query(query_text)
+            query_embeddings = [query_embedding] if query_embedding else None
             results = self.collection.query(
-                query_texts=[query_text],
-                n_results=min(n_results, self.collection.count() or 1),
+                query_texts=None if query_embeddings else [query_text],
+                query_embeddings=query_embeddings,
+                n_results=min(n_results, total),
                 where=where_filter if where_filter else None,
+                include=include or ["documents", "metadatas", "distances"],
             )
         except Exception as e:
             logger.error(f"ChromaDB query error: {e}")
             return []
 
         documents = []
-        if results and results["documents"]:
-            for i, doc in enumerate(results["documents"][0]):
-                metadata = results["metadatas"][0][i] if results["metadatas"] else {}
-                distance = results["distances"][0][i] if results["distances"] else None
-                documents.append({
-                    "content": doc,
-                    "metadata": metadata,
-                    "relevance_score": 1 - (distance or 0),  # Convert distance to similarity
-                })
+        if results and results["ids"]:
+            ids = results["ids"][0]
+            docs = results.get("documents")
+            metadatas = results.get("metadatas")
+            distances = results.get("distances")
+            contents = docs[0] if docs else [""] * len(ids)
+            metas = metadatas[0] if metadatas else [None] * len(ids)
+            # Convert distances to similarities for the whole result list at once (a missing distance counts as 0)
+            scores = (
+                (1.0 - np.nan_to_num(np.asarray(distances[0], dtype=np.float64))).tolist()
+                if distances
+                else [None] * len(ids)
+            )
+            documents = [
+                {
+                    "id": doc_id,
+                    "content": content,
+                    "metadata": meta if meta is not None else {},
+                    "relevance_score": score,
+                }
+                for doc_id, content, meta, score in zip(ids, contents, metas, scores)
+            ]
 
         return documents
 
@@ -250,25 +804,154 @@ class MedicalVectorStore:
             pass
         return None
 
+    def get_titles(self, case_ids: list[str]) -> dict[str, str]:
+        """Map case ids to titles, read from their full_narrative chunks in one lookup."""
+        if not case_ids:
+            return {}
+        try:
+            result = self.collection.get(ids=[f"{case_id}_full" for case_id in case_ids], include=["metadatas"])
+        except Exception as e:
+            logger.debug(f"Title lookup failed: {e}")
+            return {}
+        return {
+            meta.get("case_id", ""): meta.get("title", "")
+            for meta in result.get("metadatas") or []
+            if meta
+        }
+
+    def get_cached_evaluation(
+        self,
+        case_id: str,
+        correct_diagnosis: str,
+        student_diagnosis: str,
+        student_reasoning: str,
+    ) -> Optional[dict]:
+        """Return a stored evaluation for the same diagnosis on the same case with near-identical reasoning.
+
+        The diagnosis must match exactly (after normalizing case and whitespace); only the
+        reasoning is compared by embedding, so a different answer never reuses another's verdict.
+        """
+        where = {"$and": [
+            {"case_id": case_id},
+            {"correct_diagnosis": correct_diagnosis},
+            {"student_diagnosis": self._normalize_diagnosis(student_diagnosis)},
+        ]}
+        try:
+            query_embedding = self.embed_query(student_reasoning)
+            results = self.evaluation_cache.query(
+                query_texts=None if query_embedding else [student_reasoning],
+                query_embeddings=[query_embedding] if query_embedding else None,
+                n_results=1,
+                where=where,
+                include=["metadatas", "distances"],
+            )
+        except Exception as e:
+            logger.debug(f"Evaluation cache lookup failed: {e}")
+            return None
+
+        if not results or not results["ids"] or not results["ids"][0]:
+            return None
+        if results["distances"][0][0] > EVALUATION_CACHE_MAX_DISTANCE:
+            return None
+        return fast_json.loads(results["metadatas"][0][0]["evaluation"])
+
+    def cache_evaluation(
+        self,
+        case_id: str,
+        correct_diagnosis: str,
+        student_diagnosis: str,
+        student_reasoning: str,
+        evaluation: dict,
+    ):
+        """Store an evaluation so later submissions of the same diagnosis with similar reasoning can reuse it."""
+        diagnosis = self._normalize_diagnosis(student_diagnosis)
+        key = f"{case_id}||{correct_diagnosis}||{diagnosis}||{student_reasoning}"
+        try:
+            # Same embedder as the lookup (get_cached_evaluation just embedded this text, so it's cached)
+            embedding = self.embed_query(student_reasoning)
+            self.evaluation_cache.upsert(
+                ids=[hashlib.sha1(key.encode()).hexdigest()],
+                documents=[student_reasoning],
+                embeddings=[embedding] if embedding else None,
+                metadatas=[{
+                    "case_id": case_id,
+                    "correct_diagnosis": correct_diagnosis,
+                    "student_diagnosis": diagnosis,
+                    "evaluation": fast_json.dumps(evaluation).decode(),
+                }],
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache evaluation for case {case_id}: {e}")
+
+    @staticmethod
+    def _normalize_diagnosis(diagnosis: str) -> str:
+        return " ".join(diagnosis.lower().split())
+
     def get_specialties(self) -> list[str]:
-        """Get list of unique specialties in the corpus."""
+        """Get list of unique specialties in the corpus, cached until the next write."""
+        cached = self._specialties_cache
+        if cached is not None and cached[0] == self.generation:
+            return list(cached[1])
+
+        generation = self.generation
         try:
-            result = self.collection.get(where={"chunk_type": "full_narrative"})
-            if result and result["metadatas"]:
-                return sorted(set(m.get("specialty", "") for m in result["metadatas"] if m.get("specialty")))
+            result = self.collection.get(where={"chunk_type": "full_narrative"}, include=["metadatas"])
         except Exception:
-            pass
-        return []
+            return []
+        specialties = []
+        if result and result["metadatas"]:
+            specialties = sorted(set(m.get("specialty", "") for m in result["metadatas"] if m.get("specialty")))
+        self._specialties_cache = (generation, specialties)
+        # One metadata row per case, so the case count comes for free
+        self._case_count_cache = (generation, len(result["metadatas"]) if result and result["metadatas"] else 0)
+        return list(specialties)
+
+    def count_cases(self) -> int:
+        """Number of cases in the corpus (one full_narrative chunk each), cached until the next write."""
+        self.count()  # picks up writes from other processes before the cache is trusted
+        cached = self._case_count_cache
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+
+        generation = self.generation
+        try:
+            result = self.collection.get(where={"chunk_type": "full_narrative"}, include=[])
+        except Exception:
+            return 0
+        cases = len(result["ids"]) if result and result["ids"] else 0
+        self._case_count_cache = (generation, cases)
+        return cases
 
     def count(self) -> int:
-        """Get total number of documents in the collection."""
-        return self.collection.count()
+        """Get total number of documents in the collection.
+
+        Uses the local running count, re-reading Chroma when it is zero (so a store filled by
+        another process is never treated as empty) or once it is COUNT_REFRESH_SECONDS old.
+        A count changed by someone else bumps generation, invalidating cached results.
+        """
+        now = time.monotonic()
+        if self._count == 0 or now - self._count_checked_at >= COUNT_REFRESH_SECONDS:
+            try:
+                count = self.collection.count()
+            except Exception as e:
+                logger.warning(f"ChromaDB count failed, using the local count: {e}")
+            else:
+                self._count_checked_at = now
+                if count != self._count:
+                    self._count = count
+                    self.generation += 1
+        return self._count
 
     def reset(self):
         """Delete and recreate the collection."""
         self.client.delete_collection(COLLECTION_NAME)
         self.collection = self.client.get_or_create_collection(
             name=COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"},
+            metadata=COLLECTION_METADATA,
         )
+        self._count = 0
+        self.generation += 1
+        # Empty collection, so the specialty list is known without asking Chroma
+        self._specialties_cache = (self.generation, [])
+        self._case_count_cache = (self.generation, 0)
         logger.info("Vector store reset complete")
@@ -4,16 +4,103 @@ All analytics data is derived from REAL session activity. No hardcoded demo data
 Analytics start empty and build up as the student completes cases.
 """
 
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict, deque
 from datetime import datetime
 from typing import Optional
 
+# Number of most recent cases the bias checks look at
+RECENT_WINDOW = 10
+# Raw results kept in case_history; lifetime analytics come from running aggregates instead
+CASE_HISTORY_LIMIT = 64
+# Cases per point on the performance history chart
+HISTORY_BATCH_SIZE = 5
+# Specialty accuracy below WEAK is a weak area; at or above STRONG earns a challenge
+WEAK_SCORE_THRESHOLD = 60
+STRONG_SCORE_THRESHOLD = 80
+# Bias severities that earn a bias-counter recommendation
+RECOMMEND_BIAS_SEVERITIES = frozenset({"moderate", "high"})
+
+# Initial shapes for per-specialty counters, copied when a specialty is first seen
+_SPECIALTY_RESULT_TEMPLATE = {"correct": 0, "total": 0, "sum_scores": 0}
+_GRAPH_SPECIALTY_TEMPLATE = {"size": 0, "correct": 0, "total": 0}
+
+# Pieces build_knowledge_graph can assemble; callers needing less can ask for a subset
+KNOWLEDGE_GRAPH_PARTS = ("specialty", "diagnosis", "cross_links", "diag_links")
+
+# Low-severity findings reported when no bias crosses its threshold. Shared across calls
+# like the cached findings themselves, so nothing may mutate them.
+_BASELINE_BIASES = (
+    {"type": "anchoring", "severity": "low", "score": 20,
+     "evidence": "Minimal anchoring bias detected in your recent cases.",
+     "recommendation": "Continue practicing systematic differential diagnosis."},
+    {"type": "confirmation", "severity": "low", "score": 15,
+     "evidence": "Good job considering contradicting evidence.",
+     "recommendation": "Keep actively seeking disconfirming data."},
+)
+
+# Last formatted timestamp, reused for every call within the same wall-clock second
+_last_ts_sec = 0
+_last_ts_str = ""
+
+
+def _sorted_discard(items: list, entry) -> None:
+    """Remove entry from a sorted list if present, using binary search."""
+    i = bisect_left(items, entry)
+    if i < len(items) and items[i] == entry:
+        del items[i]
+
+
+def _iso_now() -> str:
+    """Local time as an ISO 8601 string at one-second resolution, formatted at most once a second."""
+    global _last_ts_sec, _last_ts_str
+    now = int(time.time())
+    if now != _last_ts_sec:
+        _last_ts_str = datetime.fromtimestamp(now).isoformat()
+        _last_ts_sec = now
+    return _last_ts_str
+
 
 class SessionTracker:
     """Tracks student case results within a session for dynamic analytics."""
 
     def __init__(self):
-        self.case_history: list[dict] = []
+        # Latest raw results only, so the singleton's memory stays flat over a long-lived process
+        self.case_history: deque[dict] = deque(maxlen=CASE_HISTORY_LIMIT)
         self.specialty_results: dict[str, dict] = {}
+        # Running totals covering every recorded case, not just those still in case_history
+        self._total_score = 0
+        self._total_cases = 0
+        # Performance history rolled up as cases arrive; only the last batch is ever open
+        self._history_batches: list[dict] = []
+        self._last_batch_sum = 0
+        # Ring buffer of the latest results for the bias checks
+        self._recent: deque[dict] = deque(maxlen=RECENT_WINDOW)
+        # Bias signals over _recent, adjusted as results enter and leave the window
+        self._recent_wrong = 0
+        self._recent_low_info = 0
+        self._recent_spec_errors: Counter[str] = Counter()
+        # Bumped on every recorded case; derived views below are cached as (value, version)
+        self._version = 0
+        # Per-specialty accuracy and the views derived from it, refreshed when a case is recorded
+        self._specialty_scores: dict[str, int] = {}
+        # First-seen position of each specialty, the tie-breaker and display order for the views
+        self._specialty_order: dict[str, int] = {}
+        # Sorted lists: weak by (score, order, spec) for the weakest pick, plus weak and strong by (order, spec)
+        self._weak_by_score: list[tuple[int, int, str]] = []
+        self._weak_by_order: list[tuple[int, str]] = []
+        self._strong_by_order: list[tuple[int, str]] = []
+        self._biases_cache: tuple[Optional[list[dict]], int] = (None, -1)
+        self._graph_cache: tuple[Optional[dict], int] = (None, -1)
+        # Knowledge graph state, updated per recorded case rather than rebuilt from case_history
+        self._graph_specialties: dict[str, dict] = {}
+        self._graph_diagnoses: dict[str, dict] = {}
+        self._graph_links: dict[tuple[str, str], dict] = {}
+        # Every pair of specialties, extended only when a new specialty first appears
+        self._graph_cross_links: list[dict] = []
 
     def record_case_result(
         self,
@@ -26,7 +113,19 @@ class SessionTracker:
         accuracy_score: int,
         stages_revealed: int = 3,
     ):
-        """Record a completed case result."""
+        """Record a completed case result.
+
+        Raises TypeError for malformed input before any state is touched, so a bad call
+        can't leave the running aggregates half-updated.
+        """
+        if not isinstance(case_id, str) or not isinstance(specialty, str) or not isinstance(correct_diagnosis, str):
+            raise TypeError("case_id, specialty and correct_diagnosis must be strings")
+        if isinstance(accuracy_score, bool) or not isinstance(accuracy_score, (int, float)):
+            raise TypeError(f"accuracy_score must be a number, got {type(accuracy_score).__name__}")
+
+        # The same few specialty names key every per-specialty dict; share one object per name
+        specialty = sys.intern(specialty)
+
         result = {
             "case_id": case_id,
             "specialty": specialty,
@@ -36,44 +135,128 @@ class SessionTracker:
             "is_correct": is_correct,
             "accuracy_score": accuracy_score,
             "stages_revealed": stages_revealed,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _iso_now(),
         }
         self.case_history.append(result)
+        if len(self._recent) == RECENT_WINDOW:
+            self._count_recent(self._recent[0], -1)
+        self._recent.append(result)
+        self._count_recent(result, 1)
+        self._total_score += accuracy_score
+        self._total_cases += 1
+        self._add_to_history(accuracy_score)
+        self._version += 1
+        self._add_to_knowledge_graph(specialty, correct_diagnosis, is_correct)
+
+        data = self.specialty_results.get(specialty)
+        if data is None:
+            data = self.specialty_results[specialty] = _SPECIALTY_RESULT_TEMPLATE.copy()
+        data["total"] += 1
+        data["sum_scores"] += accuracy_score
+        if is_correct:
+            data["correct"] += 1
+        old_score = self._specialty_scores.get(specialty)
+        self._specialty_scores[specialty] = round(data["sum_scores"] / data["total"])
+        self._update_score_views(specialty, old_score)
+
+    def _update_score_views(self, specialty: str, old_score: Optional[int]):
+        """Move one specialty between the sorted weak/strong views after its score changed."""
+        order = self._specialty_order.setdefault(specialty, len(self._specialty_order))
+        new_score = self._specialty_scores[specialty]
+
+        if old_score is not None:
+            if old_score < WEAK_SCORE_THRESHOLD:
+                _sorted_discard(self._weak_by_score, (old_score, order, specialty))
+                _sorted_discard(self._weak_by_order, (order, specialty))
+            elif old_score >= STRONG_SCORE_THRESHOLD:
+                _sorted_discard(self._strong_by_order, (order, specialty))
+
+        # Ties on score fall back to first-seen order, like the stable sort this replaces
+        if new_score < WEAK_SCORE_THRESHOLD:
+            insort(self._weak_by_score, (new_score, order, specialty))
+            insort(self._weak_by_order, (order, specialty))
+        elif new_score >= STRONG_SCORE_THRESHOLD:
+            insort(self._strong_by_order, (order, specialty))
+
+    def _add_to_history(self, accuracy_score: int):
+        """Fold the newest case into the trailing history batch, opening a new batch when full."""
+        if (self._total_cases - 1) % HISTORY_BATCH_SIZE == 0:
+            self._history_batches.append({"batch": "", "accuracy": 0, "count": 0})
+            self._last_batch_sum = 0
+        batch = self._history_batches[-1]
+        self._last_batch_sum += accuracy_score
+        batch["count"] += 1
+        batch["accuracy"] = round(self._last_batch_sum / batch["count"])
+        start = self._total_cases - batch["count"] + 1
+        batch["batch"] = f"Cases {start}-{self._total_cases}"
+
+    def _count_recent(self, result: dict, delta: int):
+        """Add (delta=1) or remove (delta=-1) one result's contribution to the recent-window signals."""
+        if not result["is_correct"]:
+            self._recent_wrong += delta
+            self._recent_spec_errors[result["specialty"]] += delta
+        if result.get("stages_revealed", 3) < 2:
+            self._recent_low_info += delta
+
+    def _add_to_knowledge_graph(self, specialty: str, diagnosis: str, is_correct: bool):
+        """Fold one case into the knowledge graph's node and link state."""
+        spec = sys.intern(specialty.capitalize())
+
+        # Specialty nodes
+        spec_data = self._graph_specialties.get(spec)
+        if spec_data is None:
+            self._graph_cross_links.extend(
+                {"source": other, "target": spec, "strength": 0.4} for other in self._graph_specialties
+            )
+            spec_data = self._graph_specialties[spec] = _GRAPH_SPECIALTY_TEMPLATE.copy()
+        spec_data["total"] += 1
+        spec_data["size"] += 1
+        if is_correct:
+            spec_data["correct"] += 1
 
-        if specialty not in self.specialty_results:
-            self.specialty_results[specialty] = {"correct": 0, "total": 0, "scores": []}
-        self.specialty_results[specialty]["total"] += 1
-        self.specialty_results[specialty]["scores"].append(accuracy_score)
+        # Diagnosis nodes
+        diag_node = self._graph_diagnoses.get(diagnosis)
+        if diag_node is None:
+            diag_node = self._graph_diagnoses[diagnosis] = {
+                "id": diagnosis, "strength": 0.0, "size": 0, "category": "diagnosis",
+            }
+        diag_node["size"] += 1
         if is_correct:
-            self.specialty_results[specialty]["correct"] += 1
+            diag_node["strength"] = min(1.0, diag_node["strength"] + 0.3)
+        else:
+            diag_node["strength"] = max(0.0, diag_node["strength"] + 0.1)
+
+        # Link diagnosis to specialty (first case for the pair sets the strength)
+        link_key = (spec, diagnosis)
+        if link_key not in self._graph_links:
+            self._graph_links[link_key] = {
+                "source": spec,
+                "target": diagnosis,
+                "strength": 0.8 if is_correct else 0.3,
+            }
 
     @property
     def cases_completed(self) -> int:
-        return len(self.case_history)
+        return self._total_cases
 
     @property
     def overall_accuracy(self) -> float:
-        if not self.case_history:
+        if not self._total_cases:
             return 0.0
-        total_score = sum(c["accuracy_score"] for c in self.case_history)
-        return round(total_score / len(self.case_history), 1)
+        return round(self._total_score / self._total_cases, 1)
 
     def get_specialty_scores(self) -> dict[str, int]:
         """Get accuracy percentage per specialty."""
-        scores = {}
-        for spec, data in self.specialty_results.items():
-            if data["scores"]:
-                scores[spec] = round(sum(data["scores"]) / len(data["scores"]))
-        return scores
+        # Callers may add to the dict (e.g. the profile endpoint), so hand out a copy
+        return dict(self._specialty_scores)
 
     def get_weak_areas(self) -> list[str]:
         """Specialties with accuracy below 60%."""
-        scores = self.get_specialty_scores()
-        return [s for s, score in scores.items() if score < 60]
+        return [spec for _, spec in self._weak_by_order]
 
     def get_performance_data(self) -> dict:
         """Build performance data from real session results only."""
-        if not self.case_history:
+        if not self._total_cases:
             return {
                 "overall_accuracy": 0,
                 "cases_completed": 0,
@@ -83,17 +266,8 @@ class SessionTracker:
                 "message": "No cases completed yet. Start a case to see your performance data.",
             }
 
-        # Build history from actual case results, grouped in batches of 5
-        history = []
-        batch_size = 5
-        for i in range(0, len(self.case_history), batch_size):
-            batch = self.case_history[i:i + batch_size]
-            batch_accuracy = round(sum(c["accuracy_score"] for c in batch) / len(batch))
-            history.append({
-                "batch": f"Cases {i + 1}-{i + len(batch)}",
-                "accuracy": batch_accuracy,
-                "count": len(batch),
-            })
+        # History from actual case results, grouped in batches of HISTORY_BATCH_SIZE
+        history = [dict(batch) for batch in self._history_batches]
 
         return {
             "overall_accuracy": self.overall_accuracy,
@@ -106,7 +280,7 @@ class SessionTracker:
     def get_student_profile(self) -> dict:
         """Build dynamic student profile from real session data only."""
         scores = self.get_specialty_scores()
-        weak = [s for s, sc in scores.items() if sc < 60]
+        weak = self.get_weak_areas()
 
         return {
             "id": "student-001",
@@ -128,41 +302,59 @@ class SessionTracker:
                 "cases_analyzed": 0,
                 "overall_accuracy": 0,
                 "message": "Complete at least 3 cases to get bias analysis.",
-                "generated_at": datetime.now().isoformat(),
+                "generated_at": _iso_now(),
             }
 
+        return {
+            "biases_detected": self._current_biases(),
+            "cases_analyzed": len(self._recent),
+            "overall_accuracy": self.overall_accuracy,
+            "generated_at": _iso_now(),
+        }
+
+    def _current_biases(self) -> list[dict]:
+        """Bias findings for the recent window, computed once per recorded case."""
+        if self.cases_completed < 3:
+            return []
+
+        cached, version = self._biases_cache
+        if cached is not None and version == self._version:
+            return cached
+
         biases = []
-        recent = self.case_history[-10:]
+        recent_count = len(self._recent)
+        wrong_count = self._recent_wrong
+        low_info_count = self._recent_low_info
+        spec_errors = self._recent_spec_errors
 
         # Anchoring: repeated wrong diagnoses
-        wrong_cases = [c for c in recent if not c["is_correct"]]
-        if len(wrong_cases) >= 3:
+        if wrong_count >= 3:
             biases.append({
                 "type": "anchoring",
-                "severity": "high" if len(wrong_cases) >= 5 else "moderate",
-                "score": min(100, len(wrong_cases) * 15),
-                "evidence": f"You missed the correct diagnosis in {len(wrong_cases)} of your last {len(recent)} cases. Consider whether you're anchoring to your initial impression.",
+                "severity": "high" if wrong_count >= 5 else "moderate",
+                "score": min(100, wrong_count * 15),
+                "evidence": f"You missed the correct diagnosis in {wrong_count} of your last {recent_count} cases. Consider whether you're anchoring to your initial impression.",
                 "recommendation": "After your initial assessment, deliberately list 3 alternative diagnoses before committing.",
             })
 
         # Premature closure: low stages revealed
-        low_info = [c for c in recent if c.get("stages_revealed", 3) < 2]
-        if len(low_info) >= 2:
+        if low_info_count >= 2:
             biases.append({
                 "type": "premature_closure",
                 "severity": "moderate",
-                "score": min(100, len(low_info) * 20),
-                "evidence": f"You diagnosed {len(low_info)} cases without revealing all available information.",
+                "score": min(100, low_info_count * 20),
+                "evidence": f"You diagnosed {low_info_count} cases without revealing all available information.",
                 "recommendation": "Gather all available data before making your diagnosis — history, exam, and labs.",
             })
 
         # Availability: same specialty errors
-        spec_errors: dict[str, int] = {}
-        for c in wrong_cases:
-            spec_errors[c["specialty"]] = spec_errors.get(c["specialty"], 0) + 1
-        repeated = [(s, n) for s, n in spec_errors.items() if n >= 2]
-        if repeated:
-            spec, count = repeated[0]
+        if any(n >= 2 for n in spec_errors.values()):
+            # Report the repeated specialty whose first error in the window came earliest
+            spec = next(
+                c["specialty"] for c in self._recent
+                if not c["is_correct"] and spec_errors[c["specialty"]] >= 2
+            )
+            count = spec_errors[spec]
             biases.append({
                 "type": "availability",
                 "severity": "moderate",
@@ -172,7 +364,7 @@ class SessionTracker:
             })
 
         # Confirmation bias: high accuracy overall but specific blind spots
-        if self.overall_accuracy > 70 and len(wrong_cases) >= 2:
+        if self.overall_accuracy > 70 and wrong_count >= 2:
             biases.append({
                 "type": "confirmation",
                 "severity": "low",
@@ -182,99 +374,66 @@ class SessionTracker:
             })
 
         if not biases:
-            biases = [
-                {"type": "anchoring", "severity": "low", "score": 20,
-                 "evidence": "Minimal anchoring bias detected in your recent cases.",
-                 "recommendation": "Continue practicing systematic differential diagnosis."},
-                {"type": "confirmation", "severity": "low", "score": 15,
-                 "evidence": "Good job considering contradicting evidence.",
-                 "recommendation": "Keep actively seeking disconfirming data."},
-            ]
+            biases = list(_BASELINE_BIASES)
 
-        return {
-            "biases_detected": biases,
-            "cases_analyzed": len(recent),
-            "overall_accuracy": self.overall_accuracy,
-            "generated_at": datetime.now().isoformat(),
-        }
+        self._biases_cache = (biases, self._version)
+        return biases
+
+    def build_knowledge_graph(self, include: tuple[str, ...] = KNOWLEDGE_GRAPH_PARTS) -> dict:
+        """Build knowledge graph from real session data only.
 
-    def build_knowledge_graph(self) -> dict:
-        """Build knowledge graph from real session data only."""
-        if not self.case_history:
+        `include` picks which of KNOWLEDGE_GRAPH_PARTS to assemble; node and link lists
+        keep their usual order with the skipped parts left out. Only the full graph is cached.
+        """
+        if not self._total_cases:
             return {
                 "nodes": [],
                 "links": [],
                 "message": "Complete cases to build your knowledge graph.",
             }
 
+        full = tuple(include) == KNOWLEDGE_GRAPH_PARTS
+        if full:
+            cached, version = self._graph_cache
+            if cached is not None and version == self._version:
+                return cached
+
         nodes = []
+        if "specialty" in include:
+            nodes.extend(self._specialty_node_view())
+        if "diagnosis" in include:
+            nodes.extend(self._diagnosis_node_view())
+
         links = []
-        seen_specialties: dict[str, dict] = {}
-        seen_diagnoses: dict[str, dict] = {}
-        diagnosis_links: list[dict] = []
-
-        for case in self.case_history:
-            diag = case["correct_diagnosis"]
-            spec = case["specialty"].capitalize()
-
-            # Build specialty nodes
-            if spec not in seen_specialties:
-                seen_specialties[spec] = {
-                    "id": spec, "strength": 0.0, "size": 0, "category": "specialty",
-                    "correct": 0, "total": 0,
-                }
-            seen_specialties[spec]["total"] += 1
-            seen_specialties[spec]["size"] += 1
-            if case["is_correct"]:
-                seen_specialties[spec]["correct"] += 1
-
-            # Build diagnosis nodes
-            if diag not in seen_diagnoses:
-                seen_diagnoses[diag] = {
-                    "id": diag, "strength": 0.0, "size": 0, "category": "diagnosis",
-                }
-            seen_diagnoses[diag]["size"] += 1
-            if case["is_correct"]:
-                seen_diagnoses[diag]["strength"] = min(1.0, seen_diagnoses[diag]["strength"] + 0.3)
-            else:
-                seen_diagnoses[diag]["strength"] = max(0.0, seen_diagnoses[diag]["strength"] + 0.1)
-
-            # Link diagnosis to specialty
-            link_id = f"{spec}-{diag}"
-            existing = next((l for l in diagnosis_links if f"{l['source']}-{l['target']}" == link_id), None)
-            if not existing:
-                diagnosis_links.append({
-                    "source": spec,
-                    "target": diag,
-                    "strength": 0.8 if case["is_correct"] else 0.3,
-                })
-
-        # Calculate specialty strengths
-        for spec_data in seen_specialties.values():
-            if spec_data["total"] > 0:
-                spec_data["strength"] = round(spec_data["correct"] / spec_data["total"], 2)
-            del spec_data["correct"]
-            del spec_data["total"]
-
-        nodes = list(seen_specialties.values()) + list(seen_diagnoses.values())
-
-        # Add cross-specialty links
-        spec_list = list(seen_specialties.keys())
-        for i in range(len(spec_list)):
-            for j in range(i + 1, len(spec_list)):
-                links.append({
-                    "source": spec_list[i],
-                    "target": spec_list[j],
-                    "strength": 0.4,
-                })
-
-        links.extend(diagnosis_links)
-
-        return {"nodes": nodes, "links": links}
+        if "cross_links" in include:
+            links.extend(dict(link) for link in self._graph_cross_links)
+        if "diag_links" in include:
+            links.extend(dict(link) for link in self._graph_links.values())
+
+        graph = {"nodes": nodes, "links": links}
+        if full:
+            self._graph_cache = (graph, self._version)
+        return graph
+
+    def _specialty_node_view(self) -> list[dict]:
+        """Specialty nodes with strength = fraction of that specialty's cases answered correctly."""
+        return [
+            {
+                "id": spec,
+                "strength": round(data["correct"] / data["total"], 2),
+                "size": data["size"],
+                "category": "specialty",
+            }
+            for spec, data in self._graph_specialties.items()
+        ]
+
+    def _diagnosis_node_view(self) -> list[dict]:
+        """Copies of the diagnosis nodes, in first-seen order."""
+        return [dict(node) for node in self._graph_diagnoses.values()]
 
     def get_recommendations(self) -> list[dict]:
         """Generate recommendations based on real session performance."""
-        if not self.case_history:
+        if not self._total_cases:
             return [{
                 "type": "start",
                 "specialty": "Any",
@@ -283,14 +442,11 @@ class SessionTracker:
                 "priority": "high",
             }]
 
-        scores = self.get_specialty_scores()
         recommendations = []
 
         # Weak areas
-        weak = [(s, sc) for s, sc in scores.items() if sc < 60]
-        weak.sort(key=lambda x: x[1])
-        if weak:
-            spec, score = weak[0]
+        if self._weak_by_score:
+            score, _, spec = self._weak_by_score[0]
             recommendations.append({
                 "type": "weak_area",
                 "specialty": spec.capitalize(),
@@ -300,21 +456,20 @@ class SessionTracker:
             })
 
         # Bias counter
-        biases = self.detect_biases()
-        high_biases = [b for b in biases.get("biases_detected", []) if b["severity"] in ("moderate", "high")]
-        if high_biases:
+        top_bias = next((b for b in self._current_biases() if b["severity"] in RECOMMEND_BIAS_SEVERITIES), None)
+        if top_bias:
             recommendations.append({
                 "type": "bias_counter",
                 "specialty": "Mixed",
                 "difficulty": "intermediate",
-                "reason": f"Atypical presentation cases to reduce your {high_biases[0]['type']} bias pattern.",
+                "reason": f"Atypical presentation cases to reduce your {top_bias['type']} bias pattern.",
                 "priority": "medium",
             })
 
         # Challenge for strong areas
-        strong = [(s, sc) for s, sc in scores.items() if sc >= 80]
-        if strong:
-            spec, score = strong[0]
+        if self._strong_by_order:
+            spec = self._strong_by_order[0][1]
+            score = self._specialty_scores[spec]
             recommendations.append({
                 "type": "challenge",
                 "specialty": spec.capitalize(),
@@ -335,5 +490,26 @@ class SessionTracker:
         return recommendations
 
 
-# Singleton instance shared across the app
+# Singleton instance shared across the app; also serves requests that carry no session id
 session = SessionTracker()
+
+# Most per-client trackers kept at once; the least recently used is dropped beyond this
+MAX_SESSIONS = 10_000
+
+_sessions: OrderedDict[str, SessionTracker] = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def get_session(session_id: Optional[str] = None) -> SessionTracker:
+    """Tracker for session_id, created on first use; the shared `session` when no id is given."""
+    if not session_id:
+        return session
+    with _sessions_lock:
+        tracker = _sessions.get(session_id)
+        if tracker is not None:
+            _sessions.move_to_end(session_id)
+            return tracker
+        tracker = _sessions[session_id] = SessionTracker()
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+        return tracker
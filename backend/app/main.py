@@ -1,22 +1,73 @@
+import importlib
 import logging
 import os
 from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 # Load .env from backend/ directory (local dev); HF Spaces injects env vars directly
 env_path = Path(__file__).resolve().parent.parent / ".env"
 if env_path.exists():
     load_dotenv(env_path)
 
-from app.api import cases, student, analytics, agents, simulation, reasoning, adversarial, bias_detection, profile
+from app.utils import fast_json
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
 
+# (module under app.api, prefix, tag) for every API router, mounted in this order
+ROUTERS = (
+    ("cases", "/api/cases", "cases"),
+    ("student", "/api/student", "student"),
+    ("analytics", "/api/analytics", "analytics"),
+    ("agents", "/api/agents", "agents"),
+    ("simulation", "/api/simulation", "simulation"),
+    ("reasoning", "/api/reasoning", "reasoning"),
+    ("adversarial", "/api/adversarial", "adversarial"),
+    ("bias_detection", "/api/bias", "bias-detection"),
+    ("profile", "/api/profile", "profile"),
+)
+
+
+def _enabled_routers() -> tuple[tuple[str, str, str], ...]:
+    """ROUTERS filtered by ENABLED_ROUTERS (comma-separated module names); unset mounts all."""
+    raw = os.environ.get("ENABLED_ROUTERS")
+    if not raw:
+        return ROUTERS
+    wanted = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = wanted - {module for module, _, _ in ROUTERS}
+    if unknown:
+        logger.warning(f"ENABLED_ROUTERS has unknown routers: {', '.join(sorted(unknown))}")
+    return tuple(entry for entry in ROUTERS if entry[0] in wanted)
+
+
+DEFAULT_CORS_ORIGINS = [
+    "http://localhost:3000",
+    "http://localhost:5173",
+    "http://localhost:7860",
+    "https://arjitmat-clinical-mind.hf.space",
+]
+
+
+def _cors_origins() -> list[str]:
+    """Allowed origins from BACKEND_CORS_ORIGINS (a JSON list), else the built-in defaults."""
+    raw = os.environ.get("BACKEND_CORS_ORIGINS")
+    if not raw:
+        return DEFAULT_CORS_ORIGINS
+    try:
+        origins = fast_json.loads(raw)
+    except fast_json.JSONDecodeError:
+        logger.warning("BACKEND_CORS_ORIGINS is not valid JSON; using default origins")
+        return DEFAULT_CORS_ORIGINS
+    if not isinstance(origins, list) or not all(isinstance(o, str) for o in origins):
+        logger.warning("BACKEND_CORS_ORIGINS must be a JSON list of strings; using default origins")
+        return DEFAULT_CORS_ORIGINS
+    return origins
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -24,7 +75,10 @@ async def lifespan(app: FastAPI):
     logger.info("Initializing Clinical-Mind RAG system...")
     from app.core.rag.vector_store import MedicalVectorStore
 
-    store = MedicalVectorStore()
+    # Load the embedding model alongside ChromaDB startup; every store in the process shares it
+    MedicalVectorStore.prewarm_embedder()
+    # Opened once here and reused by /health rather than reconnecting per request
+    store = app.state.vector_store = MedicalVectorStore()
     if store.count() == 0:
         logger.info("Vector store empty — ingesting seed corpus...")
         count = store.ingest_corpus()
@@ -35,6 +89,11 @@ async def lifespan(app: FastAPI):
     yield
 
     logger.info("Clinical-Mind shutting down")
+    from app.core.rag.shared import get_case_generator
+
+    # Only if a request created it; calling get_case_generator() here would build one
+    if get_case_generator.cache_info().currsize:
+        get_case_generator().stop_cleanup()
 
 
 app = FastAPI(
@@ -42,30 +101,23 @@ app = FastAPI(
     description="AI-powered clinical reasoning simulator for medical students",
     version="2.0.0",
     lifespan=lifespan,
+    # Analytics and simulation payloads are large nested dicts; orjson encodes them in C
+    default_response_class=ORJSONResponse if fast_json.orjson is not None else JSONResponse,
 )
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "http://localhost:5173",
-        "http://localhost:7860",
-        "https://arjitmat-clinical-mind.hf.space",
-    ],
+    allow_origins=_cors_origins(),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-app.include_router(cases.router, prefix="/api/cases", tags=["cases"])
-app.include_router(student.router, prefix="/api/student", tags=["student"])
-app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
-app.include_router(agents.router, prefix="/api/agents", tags=["agents"])
-app.include_router(simulation.router, prefix="/api/simulation", tags=["simulation"])
-app.include_router(reasoning.router, prefix="/api/reasoning", tags=["reasoning"])
-app.include_router(adversarial.router, prefix="/api/adversarial", tags=["adversarial"])
-app.include_router(bias_detection.router, prefix="/api/bias", tags=["bias-detection"])
-app.include_router(profile.router, prefix="/api/profile", tags=["profile"])
+# Routers are imported here, not at the top, so disabled ones (and the agents, LLM clients
+# and vector store handles they create at import) are never loaded
+for module_name, prefix, tag in _enabled_routers():
+    module = importlib.import_module(f"app.api.{module_name}")
+    app.include_router(module.router, prefix=prefix, tags=[tag])
 
 
 @app.get("/")
@@ -74,12 +126,10 @@ async def root():
 
 
 @app.get("/health")
-async def health():
-    from app.core.rag.vector_store import MedicalVectorStore
-
-    store = MedicalVectorStore()
+async def health(request: Request):
+    count = request.app.state.vector_store.count()
     return {
         "status": "healthy",
-        "rag_documents": store.count(),
-        "rag_status": "loaded" if store.count() > 0 else "empty",
+        "rag_documents": count,
+        "rag_status": "loaded" if count > 0 else "empty",
     }
@@ -40,7 +40,7 @@ def main():
     print("Reingestion Complete!")
     print("=" * 60)
     print(f"Total document chunks ingested: {final_count}")
-    print(f"Total unique cases: {final_count // 3}")  # 3 chunks per case
+    print(f"Total unique cases: {store.last_ingest.cases}")
     print(f"Specialties covered: {len(specialties)}")
     print(f"Specialty list: {', '.join(specialties)}")
     print("=" * 60)
@@ -8,9 +8,15 @@ Usage:
     # Ingest with reset (clear existing data first)
     python -m scripts.ingest --reset
 
+    # Write to ChromaDB in larger batches
+    python -m scripts.ingest --batch-size 500
+
     # Scrape from a specific source
     python -m scripts.ingest --scrape japi
 
+    # Scrape with more articles in flight
+    python -m scripts.ingest --scrape japi --concurrency 16
+
     # Ingest a PDF file
     python -m scripts.ingest --pdf /path/to/textbook.pdf
 
@@ -19,6 +25,7 @@ Usage:
 """
 
 import argparse
+import asyncio
 import logging
 import sys
 from pathlib import Path
@@ -26,9 +33,6 @@ from pathlib import Path
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from app.core.rag.vector_store import MedicalVectorStore
-from app.core.rag.retriever import MedicalRetriever
-
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(name)s] %(levelname)s: %(message)s",
@@ -41,17 +45,48 @@ def main():
     parser.add_argument("--reset", action="store_true", help="Reset vector store before ingesting")
     parser.add_argument("--stats", action="store_true", help="Show corpus statistics")
     parser.add_argument("--scrape", type=str, help="Scrape source (japi, ijmr, ijem)")
+    parser.add_argument(
+        "--concurrency", type=int,
+        help="Articles fetched at once when scraping (default: the scraper's ASYNC_CONCURRENCY)",
+    )
     parser.add_argument("--pdf", type=str, help="Ingest a PDF file")
     parser.add_argument("--corpus-dir", type=str, help="Custom corpus directory path")
+    parser.add_argument(
+        "--batch-size", type=int,
+        help="Chunks per ChromaDB add() call (default: the vector store's INGEST_BATCH_SIZE)",
+    )
+    parser.add_argument(
+        "--workers", type=int,
+        help="Processes that parse and chunk corpus files (default: INGEST_WORKERS; 0 = in-process)",
+    )
     parser.add_argument("--query", type=str, help="Test query against the vector store")
     parser.add_argument("--specialty", type=str, help="Filter by specialty (for query)")
     args = parser.parse_args()
-
-    store = MedicalVectorStore()
-    retriever = MedicalRetriever(store)
+    if args.batch_size is not None and args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.workers is not None and args.workers < 0:
+        parser.error("--workers must not be negative")
+
+    # Imported only once arguments are valid: the vector store pulls in chromadb and numpy,
+    # which --help and argument errors should not pay for
+    from app.core.rag.vector_store import INGEST_BATCH_SIZE, INGEST_WORKERS, MedicalVectorStore
+
+    batch_size = args.batch_size or INGEST_BATCH_SIZE
+    workers = INGEST_WORKERS if args.workers is None else args.workers
+
+    # --stats only reads counts and metadata, so it skips loading the embedding model. Every
+    # other path embeds, so start loading the model now, overlapping ChromaDB startup and scraping.
+    if not args.stats:
+        MedicalVectorStore.prewarm_embedder()
+    # A --query run is a fresh process, so let its query embedding persist for the next run
+    store = MedicalVectorStore(load_embedder=not args.stats, persist_query_embeddings=bool(args.query))
 
     if args.stats:
-        stats = retriever.get_corpus_stats()
+        from app.core.rag.retriever import MedicalRetriever
+
+        stats = MedicalRetriever(store).get_corpus_stats()
         print("\n=== Clinical-Mind RAG Corpus Statistics ===")
         print(f"  Total documents:  {stats['total_documents']}")
         print(f"  Total cases:      {stats['total_cases']}")
@@ -66,15 +101,16 @@ def main():
         logger.info("Vector store cleared")
 
     if args.scrape:
-        from app.core.rag.scraper import MedicalCorpusScraper
+        from app.core.rag.scraper import ASYNC_CONCURRENCY, MedicalCorpusScraper
 
         scraper = MedicalCorpusScraper()
         logger.info(f"Scraping from: {args.scrape}")
-        cases = scraper.scrape_source(args.scrape)
+        concurrency = args.concurrency or ASYNC_CONCURRENCY
+        cases = asyncio.run(scraper.scrape_source_async(args.scrape, concurrency=concurrency))
         if cases:
-            scraper.save_scraped_cases(cases, f"{args.scrape}_scraped.json")
+            scraper.save_scraped_cases(cases, f"{args.scrape}_scraped.jsonl")
             # Re-ingest all corpus (includes newly scraped)
-            count = store.ingest_corpus()
+            count = store.ingest_corpus(batch_size=batch_size, workers=workers)
             logger.info(f"Ingested {count} total chunks")
         else:
             logger.warning("No cases scraped. Check source URL and network connectivity.")
@@ -89,7 +125,7 @@ def main():
         if cases:
             pdf_name = Path(args.pdf).stem
             scraper.save_scraped_cases(cases, f"pdf_{pdf_name}.json")
-            count = store.ingest_corpus()
+            count = store.ingest_corpus(batch_size=batch_size, workers=workers)
             logger.info(f"Ingested {count} total chunks")
         else:
             logger.warning("No cases extracted from PDF.")
@@ -115,12 +151,15 @@ def main():
     # Default: ingest seed corpus
     logger.info("Ingesting seed medical corpus into ChromaDB...")
     corpus_dir = args.corpus_dir if args.corpus_dir else None
-    count = store.ingest_corpus(corpus_dir)
+    count = store.ingest_corpus(corpus_dir, batch_size=batch_size, workers=workers)
     logger.info(f"Done! Ingested {count} document chunks")
 
-    # Show stats
-    stats = retriever.get_corpus_stats()
+    from app.core.rag.retriever import MedicalRetriever
+
+    # Show stats; after a reset or into an empty store, neither needs a collection scan
+    stats = MedicalRetriever(store).get_corpus_stats()
     print(f"\n=== Ingestion Complete ===")
+    print(f"  Added:     {store.last_ingest.chunks} chunks from {store.last_ingest.cases} cases")
     print(f"  Documents: {stats['total_documents']}")
     print(f"  Cases:     {stats['total_cases']}")
     print(f"  Specialties: {', '.join(stats['specialties'])}")
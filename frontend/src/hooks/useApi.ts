@@ -9,9 +9,23 @@ const getApiBaseUrl = () => {
 
 const API_BASE = getApiBaseUrl();
 
+// Per-browser id so the backend keeps this student's progress apart from other users'
+const SESSION_ID_KEY = 'clinicalMindSessionId';
+
+const getSessionId = (): string => {
+  let id = localStorage.getItem(SESSION_ID_KEY);
+  if (!id) {
+    id = typeof crypto !== 'undefined' && 'randomUUID' in crypto
+      ? crypto.randomUUID()
+      : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    localStorage.setItem(SESSION_ID_KEY, id);
+  }
+  return id;
+};
+
 async function request<T>(path: string, options?: RequestInit): Promise<T> {
   const res = await fetch(`${API_BASE}${path}`, {
-    headers: { 'Content-Type': 'application/json' },
+    headers: { 'Content-Type': 'application/json', 'X-Session-Id': getSessionId() },
     ...options,
   });
   if (!res.ok) {